@@ -0,0 +1,72 @@
+"""
+Extract time over synthetic captures: serial against a process pool.
+
+    python bench_extract.py [captures] [workers]
+
+Each capture is a legacy GraphQL JSON file holding 12 reels with some
+padding, about the size of a real response. Every run is a full rebuild,
+so no capture is served from the extract cache.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from capture import CLIPS_CONNECTION
+from reels import load_all_data
+
+REELS_PER_CAPTURE = 12
+
+
+def media(i):
+    return {
+        "code": f"C{i:010d}",
+        "pk": str(i),
+        "play_count": 1_000_000 + i,
+        "like_count": 20_000 + i % 5_000,
+        "caption": {"text": "x" * 4_000},
+        "video_versions": [
+            {"url": f"https://cdn.example/{i}_{height}.mp4", "height": height}
+            for height in (640, 960, 1280)
+        ],
+    }
+
+
+def build_captures(data_dir, count):
+    for n in range(count):
+        edges = [
+            {"node": {"media": media(n * REELS_PER_CAPTURE + i)}}
+            for i in range(REELS_PER_CAPTURE)
+        ]
+        page = {"data": {CLIPS_CONNECTION: {
+            "edges": edges,
+            "page_info": {"end_cursor": f"c{n}", "has_next_page": True},
+        }}}
+        path = Path(data_dir) / f"graphql_{1_700_000_000_000 + n}.json"
+        path.write_text(json.dumps(page, indent=2), encoding="utf-8")
+
+
+def measure(data_dir, workers):
+    started = time.perf_counter()
+    rows = load_all_data(data_dir, full_rebuild=True, workers=workers)
+    return time.perf_counter() - started, [row.to_list() for row in rows]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 4_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_captures(data_dir, count)
+        size = sum(path.stat().st_size for path in Path(data_dir).iterdir())
+        print(f"{count:,} captures, {size / 2**20:.0f} MB, {os.cpu_count()} CPUs")
+        serial, serial_rows = measure(data_dir, 1)
+        pooled, pooled_rows = measure(data_dir, workers)
+    print(f"{'serial':<12} {serial:6.2f}s")
+    print(f"{f'{workers} workers':<12} {pooled:6.2f}s  ({serial / pooled:.2f}x)")
+    print("rows match" if serial_rows == pooled_rows else "rows DIFFER")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Memory per extracted row: the old dict rows with preformatted strings
+against ReelRecord.
+
+    python bench_records.py [rows]
+"""
+import sys
+import tracemalloc
+
+from models import ReelRecord
+
+
+def dict_row(i):
+    plays = 1_000_000 + i
+    likes = 20_000 + i % 5_000
+    return {
+        "url": f"instagram.com/reel/C{i:010d}/",
+        "plays": plays,
+        "likes": likes,
+        "engagement_rate": f"{round(likes / plays * 100, 2):.2f}%",
+        "code": f"C{i:010d}",
+        "captured_at": 1_700_000_000.0 + i,
+    }
+
+
+def record_row(i):
+    return ReelRecord(
+        f"C{i:010d}", plays=1_000_000 + i, likes=20_000 + i % 5_000,
+        captured_at=1_700_000_000.0 + i,
+    )
+
+
+def measure(build, count):
+    tracemalloc.start()
+    rows = [build(i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{count:,} rows")
+    for name, build in (("dict row", dict_row), ("ReelRecord", record_row)):
+        size = measure(build, count)
+        print(f"{name:<12} {size / 2**20:8.1f} MB  {size / count:6.0f} B/row")
+
+
+if __name__ == "__main__":
+    main()
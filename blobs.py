@@ -0,0 +1,82 @@
+import os
+from pathlib import Path
+
+from utils import format_bytes, log
+
+BLOB_DIR = "blobs"
+
+
+def blob_path(base, sha256):
+    """`<base>/blobs/<first 2 hex chars>/<sha256>.mp4`"""
+    return Path(base) / BLOB_DIR / sha256[:2] / f"{sha256}.mp4"
+
+
+def store_blob(base, file, sha256):
+    """
+    Moves a finished download into the store under its hash, or drops it
+    when the same content is already stored. Returns the blob path.
+    """
+    blob = blob_path(base, sha256)
+    if blob.exists():
+        Path(file).unlink()
+    else:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(file, blob)
+    return blob
+
+
+def link_blob(blob, dest):
+    """Points `dest` at `blob` with a hardlink, or a relative symlink across devices."""
+    dest = Path(dest)
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(blob, dest)
+    except OSError:
+        os.symlink(os.path.relpath(blob, dest.parent), dest)
+
+
+def is_linked(path, blob):
+    try:
+        return os.path.samefile(path, blob)
+    except OSError:
+        return False
+
+
+def iter_blobs(base):
+    return (Path(base) / BLOB_DIR).glob("*/*.mp4")
+
+
+def referenced_blobs(base):
+    """Blobs some per-CSV folder still points to."""
+    base = Path(base)
+    referenced = set()
+    for path in base.glob("*/*.mp4"):
+        if path.parent.name != BLOB_DIR and path.is_symlink():
+            referenced.add(path.resolve())
+    for blob in iter_blobs(base):
+        # A hardlinked blob has more than its own name
+        if blob.stat().st_nlink > 1:
+            referenced.add(blob.resolve())
+    return referenced
+
+
+def collect_garbage(base, dry_run=False):
+    """
+    Deletes the blobs no per-CSV folder links to. Returns the sha256 of
+    every removed blob.
+    """
+    referenced = referenced_blobs(base)
+    removed = []
+    freed = 0
+    for blob in list(iter_blobs(base)):
+        if blob.resolve() in referenced:
+            continue
+        freed += blob.stat().st_size
+        removed.append(blob.stem)
+        if not dry_run:
+            blob.unlink()
+            if not any(blob.parent.iterdir()):
+                blob.parent.rmdir()
+    action = "Would free" if dry_run else "Freed"
+    log(f"🧹 {action} {format_bytes(freed)} from {len(removed)} unreferenced blobs")
+    return removed
@@ -0,0 +1,326 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+from utils import format_bytes, log
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used when it is missing
+    orjson = None
+
+# Segments are rotated after this many uncompressed bytes
+SEGMENT_BYTES = 64 * 1024 * 1024
+SEGMENT_GLOB = "captures_*.ndjson.gz"
+LEGACY_PREFIXES = {"graphql_": "graphql", "query_": "graphql", "rest_": "rest"}
+
+CLIPS_CONNECTION = "xdt_api__v1__clips__user__connection_v2"
+
+# The media fields anything downstream reads: extract and the metrics store
+# (code, pk, counts) and direct downloads (video_versions), plus the post time
+KEEP = True
+MEDIA_FIELDS = {
+    "code": KEEP,
+    "pk": KEEP,
+    "id": KEEP,
+    "play_count": KEEP,
+    "like_count": KEEP,
+    "taken_at": KEEP,
+    "video_versions": [
+        {"url": KEEP, "width": KEEP, "height": KEEP, "bandwidth": KEEP, "type": KEEP}
+    ],
+}
+
+# Fields kept per endpoint type. A dict keeps only its keys (projected in
+# turn), a one-item list projects every element, and KEEP stores the value
+# as is. Page info stays so captures still show where a page ended.
+PROJECTIONS = {
+    "full": None,
+    "minimal": {
+        "graphql": {
+            "data": {
+                CLIPS_CONNECTION: {
+                    "edges": [{"node": {"media": MEDIA_FIELDS}}],
+                    "page_info": KEEP,
+                },
+            },
+        },
+        "rest": {
+            "items": [{"media": MEDIA_FIELDS, **MEDIA_FIELDS}],
+            "paging_info": KEEP,
+        },
+    },
+}
+
+
+def loads(text):
+    return orjson.loads(text) if orjson else json.loads(text)
+
+
+def endpoint_type(source_url):
+    return "rest" if "clips/music" in source_url else "graphql"
+
+
+def project(data, schema):
+    """`data` cut down to the fields declared in `schema` (see `PROJECTIONS`)."""
+    if schema is KEEP:
+        return data
+    if isinstance(schema, dict) and isinstance(data, dict):
+        return {
+            key: project(data[key], field)
+            for key, field in schema.items() if key in data
+        }
+    if isinstance(schema, list) and isinstance(data, list):
+        return [project(item, schema[0]) for item in data]
+    # Unexpected shape: keep it rather than lose data
+    return data
+
+
+class CaptureLog:
+    """
+    Append-only capture store: gzip-compressed NDJSON segments, one record
+    per line with the source url, capture time and endpoint type.
+
+    Each record is flushed as it is written, so a crash loses at most the
+    record being written; readers skip a truncated tail.
+    """
+
+    def __init__(self, output_dir, max_segment_bytes=SEGMENT_BYTES):
+        self.output_dir = Path(output_dir)
+        self.max_segment_bytes = max_segment_bytes
+        self.segment = None
+        self.path = None
+        self.size = 0
+        self.count = 0
+
+    def append(self, data, source_url, captured_at, projection=None):
+        record = {
+            "ts": captured_at,
+            "url": source_url,
+            "endpoint": endpoint_type(source_url),
+            "data": data,
+        }
+        if projection:
+            record["projection"] = projection
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        if self.segment is None or self.size + len(line) > self.max_segment_bytes:
+            self._rotate()
+        self.segment.write(line)
+        self.segment.flush()
+        self.size += len(line)
+        return self.path
+
+    def _rotate(self):
+        self.close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        # Another writer of this process may have opened a segment this second
+        while True:
+            self.count += 1
+            name = f"captures_{stamp}_{os.getpid()}_{self.count:04d}.ndjson.gz"
+            self.path = self.output_dir / name
+            if not self.path.exists():
+                break
+        self.segment = gzip.open(self.path, "wb")
+        self.size = 0
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+
+def read_capture_log(path):
+    """Yields the records of one segment, stopping quietly at a truncated tail."""
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield loads(line)
+                except ValueError:
+                    log(f"⚠️ {path.name}: skipping a partial record")
+                    return
+    except (EOFError, OSError, zlib.error) as e:
+        log(f"⚠️ {path.name} ends early ({e}), keeping the records read so far")
+
+
+def read_capture_file(path):
+    """Reads a legacy one-response-per-file capture as a record."""
+    endpoint = next(
+        (kind for prefix, kind in LEGACY_PREFIXES.items() if path.name.startswith(prefix)),
+        None,
+    )
+    if endpoint is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = loads(f.read())
+    except Exception as e:
+        log(f"Error parsing {path}: {e}")
+        return None
+    stamp = re.search(r"_(\d{13})", path.name)
+    captured_at = int(stamp.group(1)) / 1000 if stamp else path.stat().st_mtime
+    return {"ts": captured_at, "url": None, "endpoint": endpoint, "data": data}
+
+
+def capture_files(data_dir):
+    """Capture segments and legacy JSON files in `data_dir`, in a stable order."""
+    data_dir = Path(data_dir)
+    segments = sorted(data_dir.glob(SEGMENT_GLOB))
+    legacy = sorted(
+        path for path in data_dir.glob("*.json")
+        if path.name.startswith(tuple(LEGACY_PREFIXES))
+    )
+    return segments + legacy
+
+
+def iter_file_records(path):
+    if path.name.endswith(".ndjson.gz"):
+        yield from read_capture_log(path)
+    else:
+        record = read_capture_file(path)
+        if record is not None:
+            yield record
+
+
+def iter_captures(data_dir):
+    """Streams every captured record in `data_dir`, from both layouts."""
+    for path in capture_files(data_dir):
+        yield from iter_file_records(path)
+
+
+class CaptureWriter:
+    """
+    Saves captured responses from a bounded queue drained by one I/O worker,
+    so the event loop driving the page never waits on the disk.
+
+    When the queue is full, `put` waits for room (backpressure) instead of
+    dropping the response. Use as `async with CaptureWriter(output_dir) as w`
+    so everything queued is written before the block exits.
+
+    `layout` is "log" for the compressed capture log or "files" for the
+    legacy one pretty-printed JSON file per response.
+
+    `projection` names an entry of `PROJECTIONS`: "full" keeps whole
+    responses, "minimal" only the media fields we read. With `raw_sample`,
+    that fraction of responses is still kept whole for debugging.
+    """
+
+    def __init__(self, output_dir, max_pending=64, layout="log", projection="full",
+                 raw_sample=0.0):
+        self.output_dir = Path(output_dir)
+        self.layout = layout
+        self.projection = projection
+        self.schema = PROJECTIONS[projection]
+        self.raw_sample = raw_sample
+        self.capture_log = CaptureLog(self.output_dir) if layout == "log" else None
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.stats = Counter()
+        self.worker = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.worker = asyncio.create_task(self._drain())
+
+    async def put(self, data, source_url, size=None):
+        """Queues a response. `size` is its body length, measured here when not given."""
+        item = (data, source_url, time.time(), size)
+        if self.queue.full():
+            self.stats["backpressure_waits"] += 1
+            started = time.monotonic()
+            await self.queue.put(item)
+            self.stats["backpressure_ms"] += int((time.monotonic() - started) * 1000)
+        else:
+            self.queue.put_nowait(item)
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.queue.qsize())
+
+    async def _drain(self):
+        while True:
+            data, source_url, captured_at, size = await self.queue.get()
+            try:
+                filename = await asyncio.to_thread(
+                    self._write, data, source_url, captured_at, size
+                )
+                self.stats["saved"] += 1
+                log(f"📦 Saved: {filename.name}")
+            except Exception as e:
+                self.stats["errors"] += 1
+                log(f"❌ Error saving response: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _project(self, data, source_url, size=None):
+        if self.schema is None:
+            return data, None
+        # Every response counts, raw samples included, or the ratio looks better than it is
+        if size is None:
+            size = len(json.dumps(data, separators=(",", ":")))
+        self.stats["bytes_in"] += size
+        if self.raw_sample and random.random() < self.raw_sample:
+            self.stats["raw_samples"] += 1
+            self.stats["bytes_kept"] += size
+            return data, None
+        kept = project(data, self.schema.get(endpoint_type(source_url), KEEP))
+        self.stats["bytes_kept"] += len(json.dumps(kept, separators=(",", ":")))
+        return kept, self.projection
+
+    def _write(self, data, source_url, captured_at, size=None):
+        data, projection = self._project(data, source_url, size)
+        if self.capture_log:
+            return self.capture_log.append(data, source_url, captured_at, projection)
+
+        timestamp = int(captured_at * 1000)
+        prefix = endpoint_type(source_url)
+        filename = self.output_dir / f"{prefix}_{timestamp}.json"
+        # Responses landing in the same millisecond get a counter suffix
+        n = 1
+        while filename.exists():
+            filename = self.output_dir / f"{prefix}_{timestamp}_{n}.json"
+            n += 1
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        return filename
+
+    async def close(self):
+        """Waits until every queued response is on disk, then stops the worker."""
+        if self.worker is None:
+            return
+        await self.queue.join()
+        self.worker.cancel()
+        try:
+            await self.worker
+        except asyncio.CancelledError:
+            pass
+        self.worker = None
+        if self.capture_log:
+            await asyncio.to_thread(self.capture_log.close)
+
+    def report(self):
+        stats = self.stats
+        log(f"💾 Responses saved: {stats['saved']} (errors: {stats['errors']})")
+        log(
+            f"⏳ Writer backpressure: {stats['backpressure_waits']} waits, "
+            f"{stats['backpressure_ms'] / 1000:.1f}s blocked, "
+            f"max queue depth {stats['max_depth']}/{self.queue.maxsize}"
+        )
+        if self.schema is not None:
+            kept = stats["bytes_kept"] / stats["bytes_in"] if stats["bytes_in"] else 0
+            log(
+                f"✂️ Projection {self.projection}: kept {format_bytes(stats['bytes_kept'])} "
+                f"of {format_bytes(stats['bytes_in'])} ({kept:.1%}), "
+                f"{stats['raw_samples']} responses sampled raw"
+            )
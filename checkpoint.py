@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+from utils import load_json, log, write_json
+
+CHECKPOINT_FILE = ".checkpoint.json"
+# Pages between saves while a scrape runs; the final save happens on exit
+SAVE_EVERY = 10
+
+
+class Checkpoint:
+    """
+    Scrape state of one target, kept in its output folder: the reels
+    request to continue from (template), the last `end_cursor`, every media
+    code seen so far and how many scrolls it took.
+
+    Codes seen in earlier runs are kept apart from the ones of this run, so
+    an incremental scrape can tell when it has caught up with old reels.
+    """
+
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / CHECKPOINT_FILE
+        state = self.load()
+        self.template = state.get("template")
+        self.end_cursor = state.get("end_cursor")
+        self.has_next_page = state.get("has_next_page", True)
+        self.scrolls = state.get("scrolls", 0)
+        self.previous = set(state.get("seen", []))
+        self.seen = set(self.previous)
+        # Set for incremental runs from the top of the feed, which must not
+        # replace the deepest cursor reached by earlier runs
+        self.keep_cursor = False
+        self.unsaved = 0
+        self.write_lock = threading.Lock()
+
+    def load(self):
+        return load_json(self.path)
+
+    @property
+    def can_resume(self):
+        return bool(self.template and self.end_cursor and self.has_next_page)
+
+    def start_from_top(self, incremental=False):
+        """
+        Prepares a run that scrolls from the top instead of resuming. Its
+        cursor replaces the saved one, so the scroll count starts over,
+        except for an incremental run over earlier reels, which keeps both.
+        """
+        self.keep_cursor = incremental and bool(self.previous)
+        if not self.keep_cursor:
+            self.scrolls = 0
+
+    def count_scroll(self):
+        # Scrolls count towards the saved cursor only while it moves with them
+        if not self.keep_cursor:
+            self.scrolls += 1
+
+    def observe(self, connection):
+        """
+        Records a page of the reels connection. Returns how many of its
+        reels were already seen in a previous run.
+        """
+        codes = [
+            (edge.get("node") or {}).get("media", {}).get("code")
+            for edge in connection.get("edges", [])
+        ]
+        codes = [code for code in codes if code]
+        known = sum(1 for code in codes if code in self.previous)
+        self.seen.update(codes)
+        self.unsaved += 1
+        if not self.keep_cursor:
+            page_info = connection.get("page_info") or {}
+            if page_info.get("end_cursor"):
+                self.end_cursor = page_info["end_cursor"]
+            self.has_next_page = page_info.get("has_next_page") is not False and bool(codes)
+        return known
+
+    def state(self):
+        return {
+            "template": self.template,
+            "end_cursor": self.end_cursor,
+            "has_next_page": self.has_next_page,
+            "scrolls": self.scrolls,
+            "updated_at": time.time(),
+            "seen": sorted(self.seen),
+        }
+
+    def save(self):
+        self.unsaved = 0
+        self._write(self.state())
+
+    async def autosave(self, every=SAVE_EVERY):
+        """
+        Saves once `every` pages were observed since the last save, writing
+        from a thread so the page loop is not blocked.
+        """
+        if self.unsaved < every:
+            return
+        self.unsaved = 0
+        await asyncio.to_thread(self._write, self.state())
+
+    def _write(self, state):
+        # Saves from the worker thread and the final one must not share the tmp file at once
+        with self.write_lock:
+            write_json(self.path, state, separators=(",", ":"))
+
+    def report(self, say=log):
+        new = len(self.seen) - len(self.previous)
+        say(f"📌 Checkpoint: {new} new reels, {len(self.seen)} seen in total")
@@ -0,0 +1,117 @@
+from array import array
+from itertools import islice
+
+from models import GainRecord
+from utils import log
+
+BATCH_ROWS = 65_536
+
+
+def import_pyarrow():
+    # pyarrow is optional, only the columnar export needs it
+    try:
+        import pyarrow
+        import pyarrow.compute
+    except ImportError:
+        log("❌ Columnar export needs pyarrow: pip install pyarrow")
+        return None
+    return pyarrow
+
+
+def build_batch(pa, records):
+    codes, urls = [], []
+    plays, likes, captured, gained = array("q"), array("q"), array("q"), array("q")
+    for record in records:
+        codes.append(record.key)
+        urls.append(record.url)
+        plays.append(record.plays)
+        likes.append(record.likes)
+        captured.append(int(record.captured_at * 1000))
+        if isinstance(record, GainRecord):
+            gained.append(record.plays_gained)
+
+    pc = pa.compute
+    plays_col = pa.array(plays, pa.int64())
+    likes_col = pa.array(likes, pa.int64())
+    # Null plays out so reels without plays get a null ratio, then zero it
+    safe_plays = pc.if_else(pc.equal(plays_col, 0), None, plays_col.cast(pa.float64()))
+    ratio = pc.divide(likes_col.cast(pa.float64()), safe_plays)
+    columns = {
+        "code": pa.array(codes, pa.string()),
+        "url": pa.array(urls, pa.string()),
+        "plays": plays_col,
+        "likes": likes_col,
+        "captured_at": pa.array(captured, pa.int64()).cast(pa.timestamp("ms")),
+        "engagement_rate": pc.fill_null(pc.round(pc.multiply(ratio, 100), 2), 0.0),
+        "likes_per_1k_plays": pc.fill_null(pc.multiply(ratio, 1000), 0.0),
+    }
+    if gained:
+        columns["plays_gained"] = pa.array(gained, pa.int64())
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+
+
+def percentile_rank(pa, column):
+    """0-100 rank of every value within the column (ties share the top rank)."""
+    pc = pa.compute
+    if len(column) == 0:
+        return pa.array([], pa.float64())
+    ranks = pc.rank(column.combine_chunks(), sort_keys="ascending", tiebreaker="max")
+    return pc.divide(pc.multiply(ranks.cast(pa.float64()), 100.0), float(len(column)))
+
+
+def export_columnar(records, output_file, fmt="parquet", batch_rows=BATCH_ROWS,
+                    streaming=False):
+    """
+    Writes records as a typed Parquet or Arrow IPC file: raw integer counts,
+    capture timestamps, and derived metrics computed with pyarrow kernels
+    one batch at a time. Returns the number of rows written, or None when
+    pyarrow is missing.
+
+    With `streaming`, each batch is written as soon as it is built so memory
+    stays bounded, and the percentile columns (which need every row at
+    once) are left out.
+    """
+    pa = import_pyarrow()
+    if pa is None:
+        return None
+
+    records = iter(records)
+    batches = (
+        build_batch(pa, chunk)
+        for chunk in iter(lambda: list(islice(records, batch_rows)), [])
+    )
+    if streaming:
+        count = 0
+        with open_writer(pa, output_file, fmt, build_batch(pa, []).schema) as writer:
+            for batch in batches:
+                writer.write_batch(batch)
+                count += batch.num_rows
+        log("ℹ️ Percentile columns are skipped when streaming, they need every row in memory")
+        log(f"[✓] Wrote {count} rows to {output_file} ({fmt})")
+        return count
+
+    batches = list(batches)
+    if batches:
+        table = pa.Table.from_batches(batches)
+    else:
+        table = pa.Table.from_batches([], schema=build_batch(pa, []).schema)
+    # Percentiles need the whole column, so they are added once at the end
+    for column in ("plays", "likes", "engagement_rate"):
+        table = table.append_column(
+            f"{column}_percentile", percentile_rank(pa, table[column])
+        )
+
+    with open_writer(pa, output_file, fmt, table.schema) as writer:
+        writer.write_table(table)
+
+    log(f"[✓] Wrote {table.num_rows} rows to {output_file} ({fmt})")
+    return table.num_rows
+
+
+def open_writer(pa, output_file, fmt, schema):
+    """A zstd-compressed Parquet writer, or an Arrow IPC file (Feather v2) writer."""
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(output_file, schema, compression="zstd")
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    return pa.ipc.new_file(output_file, schema, options=options)
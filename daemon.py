@@ -0,0 +1,243 @@
+import asyncio
+import contextlib
+import itertools
+import os
+import time
+import uuid
+from urllib.parse import urlparse
+
+import aiohttp
+from aiohttp import web
+
+from utils import log
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 9321
+# Where the daemon listens and where scrapers look for it
+DAEMON_URL_ENV = "SCRAPER_DAEMON_URL"
+# First Chrome DevTools port; each warm browser takes the next one
+CDP_PORT = 9322
+
+
+def default_daemon_url():
+    return os.environ.get(DAEMON_URL_ENV) or f"http://{DAEMON_HOST}:{DAEMON_PORT}"
+
+
+class WarmBrowser:
+    def __init__(self, browser, cdp_port):
+        self.id = uuid.uuid4().hex[:8]
+        self.browser = browser
+        self.cdp_url = f"http://{DAEMON_HOST}:{cdp_port}"
+        self.lease = None
+        self.leased_at = 0.0
+        self.idle_since = time.monotonic()
+
+    def info(self):
+        now = time.monotonic()
+        return {
+            "id": self.id,
+            "cdp_url": self.cdp_url,
+            "connected": self.browser.is_connected(),
+            "leased": self.lease is not None,
+            "idle_s": 0 if self.lease else round(now - self.idle_since),
+        }
+
+
+class BrowserDaemon:
+    """
+    Keeps `warm` Chromium instances running with their DevTools port open
+    and leases them to scrapers over a small local HTTP API:
+
+        GET  /health                       browsers and their state
+        POST /lease   {"headless": bool}   -> {"lease": id, "cdp_url": url}
+        POST /release {"lease": id}
+
+    Clients attach with `connect_over_cdp`, so starting a scrape costs a
+    new context instead of a browser launch. A lease is answered right
+    away: with an idle browser, or with 409 when there is none, and the
+    client then launches its own. Browsers are only launched in the
+    background, keeping one spare idle browser up to `max_browsers`.
+    Browsers idle for longer than `idle_seconds` beyond the warm ones are
+    closed, crashed ones are replaced, and a lease not released within
+    `lease_seconds` is taken back and its browser recycled.
+    """
+
+    def __init__(self, playwright, warm=1, max_browsers=4, headless=True,
+                 idle_seconds=600, lease_seconds=1800):
+        self.p = playwright
+        self.warm = warm
+        self.max_browsers = max(warm, max_browsers)
+        self.headless = headless
+        self.idle_seconds = idle_seconds
+        self.lease_seconds = lease_seconds
+        self.browsers = []
+        self.ports = itertools.count(CDP_PORT)
+        self.lock = asyncio.Lock()
+        # Set when a lease left no idle browser, so the next one is launched early
+        self.wanted = asyncio.Event()
+
+    async def launch(self):
+        port = next(self.ports)
+        browser = await self.p.chromium.launch(
+            headless=self.headless, args=[f"--remote-debugging-port={port}"]
+        )
+        warm = WarmBrowser(browser, port)
+        self.browsers.append(warm)
+        log(f"🔥 Browser {warm.id} ready on {warm.cdp_url}")
+        return warm
+
+    async def close(self, warm):
+        self.browsers.remove(warm)
+        with contextlib.suppress(Exception):
+            await warm.browser.close()
+        log(f"♻️ Browser {warm.id} closed")
+
+    def idle(self):
+        return [b for b in self.browsers if b.lease is None and b.browser.is_connected()]
+
+    async def fill(self):
+        while len(self.browsers) < self.warm or (
+            not self.idle() and len(self.browsers) < self.max_browsers
+        ):
+            await self.launch()
+
+    def lease(self, headless=True):
+        """
+        Leases an idle browser, or returns None. Never waits for a launch, so
+        a client never gives up on a lease the daemon has already granted.
+        """
+        if bool(headless) != self.headless:
+            return None
+        idle = self.idle()
+        if len(idle) <= 1:
+            self.wanted.set()
+        if not idle:
+            return None
+        warm = idle[0]
+        warm.lease = uuid.uuid4().hex
+        warm.leased_at = time.monotonic()
+        return warm
+
+    def release(self, lease):
+        for warm in self.browsers:
+            if warm.lease == lease:
+                warm.lease = None
+                warm.idle_since = time.monotonic()
+                return True
+        return False
+
+    async def maintain(self):
+        """
+        Replaces crashed browsers, takes back stale leases, closes idle extras
+        and launches the warm and spare ones.
+        """
+        async with self.lock:
+            now = time.monotonic()
+            for warm in list(self.browsers):
+                if not warm.browser.is_connected():
+                    log(f"⚠️ Browser {warm.id} disconnected")
+                    await self.close(warm)
+                elif warm.lease and now - warm.leased_at > self.lease_seconds:
+                    log(f"⏰ Lease on browser {warm.id} expired, recycling it")
+                    await self.close(warm)
+            idle = [b for b in self.browsers if b.lease is None]
+            for warm in idle[self.warm:]:
+                # Checked again, it may have been leased while another one closed
+                if warm.lease is None and now - warm.idle_since > self.idle_seconds:
+                    await self.close(warm)
+            await self.fill()
+
+    def app(self):
+        async def health(request):
+            return web.json_response({
+                "ok": True,
+                "headless": self.headless,
+                "browsers": [warm.info() for warm in self.browsers],
+            })
+
+        async def lease(request):
+            body = await request.json() if request.can_read_body else {}
+            warm = self.lease(body.get("headless", True))
+            if warm is None:
+                return web.json_response({"error": "no browser available"}, status=409)
+            return web.json_response({"lease": warm.lease, "cdp_url": warm.cdp_url})
+
+        async def release(request):
+            body = await request.json()
+            return web.json_response({"released": self.release(body.get("lease"))})
+
+        app = web.Application()
+        app.router.add_get("/health", health)
+        app.router.add_post("/lease", lease)
+        app.router.add_post("/release", release)
+        return app
+
+    async def serve(self, url=None, check_every=30):
+        url = urlparse(url or default_daemon_url())
+        await self.fill()
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, url.hostname, url.port).start()
+        log(f"🧭 Browser daemon listening on http://{url.hostname}:{url.port}")
+        try:
+            while True:
+                # Woken early when a lease took the last idle browser
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.wanted.wait(), check_every)
+                self.wanted.clear()
+                await self.maintain()
+        finally:
+            await runner.cleanup()
+            for warm in list(self.browsers):
+                await self.close(warm)
+
+
+async def run_daemon(url=None, **options):
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        await BrowserDaemon(p, **options).serve(url)
+
+
+@contextlib.asynccontextmanager
+async def lease_browser(p, launch, headless=False, slow_mo=0, daemon_url=None):
+    """
+    A browser from the daemon when one is running, else `await launch()`.
+    Either way the browser is closed (or detached from) on exit.
+    """
+    daemon_url = daemon_url or default_daemon_url()
+    lease = None
+    try:
+        # The daemon is local, so a short timeout keeps the fallback fast
+        timeout = aiohttp.ClientTimeout(total=0.5)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            async with http.post(f"{daemon_url}/lease", json={"headless": bool(headless)}) as res:
+                if res.status == 200:
+                    lease = await res.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        pass
+
+    browser = None
+    if lease:
+        try:
+            browser = await p.chromium.connect_over_cdp(lease["cdp_url"], slow_mo=slow_mo)
+            log("⚡ Using a warm browser from the daemon")
+        except Exception as e:
+            log(f"⚠️ Could not attach to the daemon's browser ({e}), launching one")
+            await release_lease(daemon_url, lease)
+            lease = None
+    if browser is None:
+        browser = await launch()
+    try:
+        yield browser
+    finally:
+        with contextlib.suppress(Exception):
+            await browser.close()
+        if lease:
+            await release_lease(daemon_url, lease)
+
+
+async def release_lease(daemon_url, lease):
+    with contextlib.suppress(aiohttp.ClientError, asyncio.TimeoutError):
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=2)) as http:
+            await http.post(f"{daemon_url}/release", json={"lease": lease["lease"]})
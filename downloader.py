@@ -1,21 +1,62 @@
-# import os
+import os
 import random
 import asyncio
-# from pathlib import Path
+from pathlib import Path
 from urllib.parse import urlparse
-from utils import load_csv_rows
+
+import aiohttp
+
+import blobs
+import journal
+from media import LINK_GONE, fetch_video, index_video_versions, open_session, pick_rendition
+from scheduler import Progress, prioritize
+from utils import TokenBucket, format_bytes, hash_file, load_csv_rows
+
+
+def parse_reel_id(url):
+    """The reel ID at the end of a reel URL, e.g. `instagram.com/reel/ABC/` -> `ABC`."""
+    url = url.strip()
+    return url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
 
 
 async def download_reels_from_csv(
     csv_path=None, output_folder=None,
-    notify=None, should_stop=None, single_url=None
+    notify=None, should_stop=None,
+    concurrency=1, rate=None, captures=None, rendition="best", retries=3,
+    store_dir=None, order_by=None, budget=None, on_progress=None
 ):
     """
-    Downloads Instagram reels from CSV  or Signle URL if exists
+    Downloads Instagram reels from CSV
 
     Args:
         csv_path (Path): Path to CSV file
         output_folder (Path): Directory to save downloads
+        concurrency (int): Number of downloads running at the same time
+        rate (float): Max downloads started per second, shared by all workers.
+            When unset, each worker sleeps a random 1-2.5s between downloads.
+        captures (Path): Capture folder to read `video_versions` URLs from.
+            Reels found there are streamed straight from the CDN over one
+            keep-alive HTTP client; the rest (or failed ones) use yt-dlp.
+        rendition (str): "best", "worst" or a max height such as "720"
+        retries (int): Attempts per reel, with exponential backoff between them
+
+        store_dir (Path): Base folder holding the blob store and the journal
+            (defaults to the parent of `output_folder`)
+        order_by (str): Download the highest "plays", "likes" or "engagement"
+            rows first instead of following the CSV order
+        budget (scheduler.Budget): Stop starting new downloads once its
+            byte, count or time limit is reached (downloads in flight finish,
+            reels already stored are still linked)
+        on_progress (callable): Called with a progress event (done, total,
+            bytes, throughput, ETA, see `scheduler.Progress`) after each row
+
+    Videos are stored once under their SHA-256 in `<store_dir>/blobs/`, and
+    `output_folder` only holds hardlinks (or symlinks) to them. A download
+    journal (`<store_dir>/downloads.db`) keyed by reel ID records what is
+    stored, so a reel already fetched for any CSV is linked without a
+    network call, even when its play count has changed.
+
+    Returns the {status: count} results, or None when there are no rows.
     """
     # Create output directory
     output_folder.mkdir(parents=True, exist_ok=True)
@@ -45,43 +86,91 @@ async def download_reels_from_csv(
         stdout, stderr = await proc.communicate()
         return proc.returncode, stdout.decode(), stderr.decode()
 
-    # Download a single URL
-    if single_url:
-        url = single_url.strip()
-        if not url.startswith(('http://', 'https://')):
-            url = f"https://{url}"
-        reel_id = url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
-        output_file = output_folder / f"{reel_id}.mp4"
-        if output_file.exists():
-            await log(f"⏩ Already exists: {reel_id}")
-            return
-        await log(f"⬇️ Downloading: {reel_id}")
-
-        returncode, _, stderr = await run_download(url, output_file)
-        if returncode == 0:
-            await log(f"✅ Saved: {reel_id}")
-        else:
-            await log(f"❌ Failed: {reel_id} | Error: {stderr.strip()}")
-        return
+    store = Path(store_dir) if store_dir else output_folder.parent
+    conn = journal.connect(store / journal.JOURNAL_FILE)
+
+    def relative(path):
+        return os.path.relpath(path, store)
+
+    index = None
+    index_lock = asyncio.Lock()
+    session = None
+    direct = 0
+    # Reels whose captured link was rejected or has expired
+    gone = set()
+
+    async def captured_versions(reel_id):
+        # Built on first use, so a run with nothing left to fetch reads no captures
+        nonlocal index
+        if not captures:
+            return []
+        async with index_lock:
+            if index is None:
+                index = await asyncio.to_thread(index_video_versions, captures)
+                if index:
+                    await log(f"🎞️ Captured video URLs found for {len(index)} reels")
+        return index.get(reel_id, [])
+
+    async def fetch(reel_id, url, output_file):
+        """
+        Downloads one reel, from its captured video URL when there is one.
+        Returns (bytes, sha256, direct); raises RuntimeError when yt-dlp fails.
+
+        A direct download that breaks off raises too, so the retry loop
+        resumes its `.part` file. Only a captured link the CDN rejects or no
+        longer serves falls back to yt-dlp.
+        """
+        nonlocal session, direct
+        video_url = pick_rendition(await captured_versions(reel_id), rendition)
+        if video_url and reel_id not in gone:
+            if session is None:
+                session = open_session(concurrency)
+            try:
+                size, sha256 = await fetch_video(session, video_url, output_file)
+                direct += 1
+                return size, sha256, True
+            except aiohttp.ClientResponseError as e:
+                if e.status not in LINK_GONE:
+                    raise
+                gone.add(reel_id)
+                await log(f"↩️ Captured link for {reel_id} returned {e.status}, using yt-dlp")
+                output_file.with_name(output_file.name + ".part").unlink(missing_ok=True)
+        # Its own name, so yt-dlp's partial file never mixes with ours
+        ytdlp_file = output_file.with_name(output_file.stem + ".ytdlp.mp4")
+        returncode, _, stderr = await run_download(url, ytdlp_file)
+        if returncode != 0:
+            raise RuntimeError(stderr.strip() or f"yt-dlp exited with code {returncode}")
+        os.replace(ytdlp_file, output_file)
+        digest = await asyncio.to_thread(hash_file, output_file)
+        return output_file.stat().st_size, digest.hexdigest(), False
 
-    # Full CSV Mode
     rows = load_csv_rows(csv_path)
     if not rows:
         await log("❌ No rows found in CSV.")
         return
+    rows = prioritize(rows, order_by)
+    progress = Progress(len(rows), budget)
 
     # Track results
-    results = {'success': 0, 'failed': 0, 'skipped': 0}
+    results = {'success': 0, 'linked': 0, 'failed': 0, 'skipped': 0}
+    limiter = TokenBucket(rate) if rate else None
+    entries = journal.entries(conn)
+    # Videos already in this folder, named "<reel id>—<plays>.mp4"
+    existing = {
+        path.stem.split('—')[0]: path for path in output_folder.glob("*.mp4") if path.exists()
+    }
+    queue = asyncio.Queue()
+    for item in enumerate(rows, 1):
+        queue.put_nowait(item)
+    # Every reel gets at least one attempt
+    retries = max(1, int(retries))
 
-    for i, row in enumerate(rows, 1):
+    async def process_row(i, row):
+        """Returns (status, bytes downloaded) for one CSV row."""
         url = row['url'].strip() if row.get('url') else ""
         plays = row['plays'].strip() if row.get('plays') else ""
         if not url:
-            continue
-
-        if should_stop and should_stop():
-            await log("🛑 Download stopped.")
-            break
+            return None, 0
 
         try:
             # Validate URL
@@ -91,39 +180,117 @@ async def download_reels_from_csv(
             parsed = urlparse(url)
             if 'instagram.com' not in parsed.netloc:
                 await log(f"⚠️ Skipping non-Instagram URL: {url}")
-                results['skipped'] += 1
-                continue
+                return 'skipped', 0
+
+            reel_id = parse_reel_id(url)
+            entry = entries.get(reel_id)
+            name = f"{reel_id}—{plays}.mp4" if plays else f"{reel_id}.mp4"
+            output_file = existing.get(reel_id) or output_folder / name
+
+            # Reels the journal has finished, whatever their plays are now,
+            # are served from the store
+            blob = store / entry['path'] if entry and entry['status'] == journal.DONE else None
+            if blob and blob.exists():
+                if blobs.is_linked(output_file, blob):
+                    await log(f"⏩ Exists: {reel_id}")
+                    return 'skipped', 0
+                blobs.link_blob(blob, output_file)
+                await log(f"🔗 Linked from store: {output_file.stem}")
+                return 'linked', 0
+            if reel_id in existing:
+                # Saved before the store existed, move it in
+                path = existing[reel_id]
+                digest = (await asyncio.to_thread(hash_file, path)).hexdigest()
+                size = path.stat().st_size
+                blobs.link_blob(blobs.store_blob(store, path, digest), path)
+                journal.finish(conn, reel_id, url, relative(blobs.blob_path(store, digest)),
+                               size, digest)
+                await log(f"⏩ Exists: {path.stem}")
+                return 'skipped', 0
+
+            # Checked and reserved with no await in between, so concurrent
+            # workers cannot overshoot the count budget
+            if budget:
+                if budget.exhausted():
+                    return 'budget', 0
+                budget.reserve()
 
-            # Extract reel ID
-            reel_id = url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
-            output_file = output_folder / f"{reel_id}—{plays}.mp4"
+            # Keep the name of an earlier attempt so its partial file is resumed
+            if entry and entry['status'] != journal.DONE and entry['path']:
+                earlier = store / entry['path']
+                if earlier.parent == output_folder:
+                    output_file = earlier
 
-            # Skip existing
-            if output_file.exists():
-                await log(f"⏩ Exists: {reel_id}—{plays}")
-                results['skipped'] += 1
-                continue
+            for attempt in range(1, retries + 1):
+                # Anti-rate-limiting delay
+                if limiter:
+                    await limiter.acquire()
 
-            await log(f"⬇️ Downloading ({i}): {reel_id}")
-            returncode, _, stderr = await run_download(url, output_file)
+                await log(f"⬇️ Downloading ({i}): {reel_id}")
+                journal.start(conn, reel_id, url, relative(output_file))
+                try:
+                    size, sha256, from_cdn = await fetch(reel_id, url, output_file)
+                except (RuntimeError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                    journal.fail(conn, reel_id, str(e))
+                    await log(f"❌ Failed: {reel_id} (try {attempt}/{retries}) | Error: {e}")
+                    if attempt < retries:
+                        await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+                        continue
+                    if budget:
+                        budget.release()
+                    return 'failed', 0
 
-            if returncode == 0:
-                results['success'] += 1
-                await log(f"✅ Saved: {reel_id}—{plays}")
-            else:
-                results['failed'] += 1
-                await log(f"❌ Failed: {reel_id} | Error: {stderr.strip()}")
+                blob = blobs.store_blob(store, output_file, sha256)
+                blobs.link_blob(blob, output_file)
+                journal.finish(conn, reel_id, url, relative(blob), size, sha256)
+                if budget:
+                    budget.spend(size)
+                await log(f"✅ Saved: {output_file.stem} ({format_bytes(size)})")
 
-            # Anti-rate-limiting delay
-            await asyncio.sleep(random.uniform(1, 2.5))
+                # CDN downloads never touch instagram.com itself
+                if not limiter and not from_cdn:
+                    await asyncio.sleep(random.uniform(1, 2.5))
+                return 'success', size
+            return 'failed', 0
 
         except Exception as e:
-            results['failed'] += 1
             print(f"⚠️ Error processing {url}: {str(e)}")
+            return 'failed', 0
+
+    stopped_by = None
+
+    async def worker():
+        nonlocal stopped_by
+        while not queue.empty():
+            if should_stop and should_stop():
+                return
+            # Rows keep coming once the budget is spent, since linking from the store is free
+            i, row = queue.get_nowait()
+            status, size = await process_row(i, row)
+            if status == 'budget':
+                stopped_by = stopped_by or budget.exhausted()
+            if status in results:
+                results[status] += 1
+            if on_progress and status and status != 'budget':
+                on_progress(progress.event(parse_reel_id(row.get('url') or ""), status, size))
+
+    workers = max(1, int(concurrency or 1))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    if session:
+        await session.close()
+    conn.close()
+
+    if stopped_by:
+        await log(f"⏹️ Stopped early: {stopped_by}.")
+    if should_stop and should_stop():
+        await log("🛑 Download stopped.")
 
     await log("\n📊 Results:")
     await log(f"• Total: {sum(results.values())}")
     await log(f"• Success: {results['success']}")
+    await log(f"• Linked from store: {results['linked']}")
     await log(f"• Failed: {results['failed']}")
     await log(f"• Skipped: {results['skipped']}")
-
+    if direct:
+        await log(f"• Direct from captures: {direct}")
+    return results
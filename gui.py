@@ -5,12 +5,13 @@ import os
 import glob
 from pathlib import Path
 from dotenv import load_dotenv
-from insta_login import login_instagram
+from insta_login import STORAGE_FILE, login_instagram
 from intrecept import run_scraper
-from reels import load_all_data, write_csv
-from utils import load_csv_rows
+from reels import format_row, load_all_data, write_csv
+import store
+from sessions import SessionPool
 from downloader import download_reels_from_csv
-from urllib.parse import urlparse
+from scheduler import Budget, format_progress
 
 CONFIG_FILE = Path(".scraper_config.json")
 
@@ -80,20 +81,28 @@ with ui.tab_panels(tabs, value=config_tab).classes('w-full'):
         ui.button("Login with .env Credentials", on_click=login).classes("mt-4")
 
     with ui.tab_panel(scrape_tab):
-        def scrape():
+        async def scrape():
             config = load_config()
-            if not Path("insta_session.json").exists():
+            pool = SessionPool()
+            session_file = await pool.acquire()
+            if session_file is None:
                 username, password = load_credentials()
-                asyncio.run(login_instagram(username, password, headless=config.get("headless")))
-
-            asyncio.create_task(run_scraper(
-                url=config["url"],
-                session_file=Path("insta_session.json"),
-                output_dir=Path(config["output_dir"]),
-                scroll_count=config["scroll_count"],
-                scroll_delay=config["scroll_delay"],
-                headless=config["headless"],
-            ))
+                ui.notify("🔑 No usable session, logging in first...")
+                await login_instagram(username, password, headless=config.get("headless"))
+                session_file = Path(STORAGE_FILE)
+
+            async def run():
+                traffic = await run_scraper(
+                    url=config["url"],
+                    session_file=session_file,
+                    output_dir=Path(config["output_dir"]),
+                    scroll_count=config["scroll_count"],
+                    scroll_delay=config["scroll_delay"],
+                    headless=config["headless"],
+                )
+                pool.quarantine_if_limited(session_file, traffic)
+
+            asyncio.create_task(run())
             ui.notify("✅ Scraping started")
 
         ui.button("Start Scraping", on_click=scrape).classes("mt-4")
@@ -104,6 +113,7 @@ with ui.tab_panels(tabs, value=config_tab).classes('w-full'):
             options=["Sort by Plays", "Sort by Likes", "Sort by Engagement"],
             value="Sort by Plays"
         ).classes("mb-4")
+        top_n = ui.number("🏆 Top N reels (0 = all)", value=0, min=0, precision=0)
 
         # Create the table with empty data initially
         table = ui.table(
@@ -131,35 +141,18 @@ with ui.tab_panels(tabs, value=config_tab).classes('w-full'):
             config = load_config()
             output_dir = Path(config.get("output_dir"))
             output_csv = output_dir.name + ".csv"
-            rows = load_all_data(output_dir)
-            
-            def sort_key(row):
-                def parse_value(value):
-                    if isinstance(value, (int, float)):
-                        return float(value)
-                    if isinstance(value, str):
-                        value = value.replace(",", "").replace(" ", "")
-                        if "M" in value:
-                            return float(value.replace("M", "")) * 1_000_000
-                        if "K" in value:
-                            return float(value.replace("K", "")) * 1_000
-                        return float(value)
-                    return 0.0
-
-                if sort_option.value == "Sort by Plays":
-                    return -parse_value(row.get("plays", 0))
-                elif sort_option.value == "Sort by Likes":
-                    return -parse_value(row.get("likes", 0))
-                elif sort_option.value == "Sort by Engagement":
-                    engagement = row.get("engagement_rate", "0%")
-                    if isinstance(engagement, str):
-                        return -float(engagement.replace("%", ""))
-                    return -float(engagement)
-                return 0
-
-            rows.sort(key=sort_key)
-            table.rows = rows
-            write_csv(rows, output_csv)
+            conn = store.connect(store.default_db_path(output_dir))
+            load_all_data(output_dir, store=conn)
+
+            order_by = {
+                "Sort by Plays": ["plays"],
+                "Sort by Likes": ["likes"],
+                "Sort by Engagement": ["engagement"],
+            }.get(sort_option.value, ["plays"])
+            rows = store.query_reels(conn, order_by, limit=int(top_n.value or 0))
+            conn.close()
+            table.rows = [format_row(record) for record in rows]
+            write_csv(rows, output_csv, sort=False)
             ui.notify(f"✅ Extracted to {output_csv}")
 
         # Button to trigger extraction and display
@@ -172,14 +165,27 @@ with ui.tab_panels(tabs, value=config_tab).classes('w-full'):
 
         input_csv = ui.input("CSV filename", value=default_csv)
         output_base = ui.input("Output base folder", value="downloads")
+        order_by = ui.radio(
+            {"csv": "CSV order", "plays": "Plays", "likes": "Likes", "engagement": "Engagement"},
+            value="csv",
+        ).props("inline")
+        with ui.row():
+            max_mb = ui.number("Max MB (0 = no limit)", value=0, min=0)
+            max_count = ui.number("Max reels (0 = no limit)", value=0, min=0)
+            max_minutes = ui.number("Max minutes (0 = no limit)", value=0, min=0)
         log = ui.log().classes("max-h-60 overflow-auto text-sm")
-        progress = ui.linear_progress(show_value=True).classes("mt-2")
+        progress = ui.linear_progress(value=0, show_value=False).classes("mt-2")
+        progress_label = ui.label("")
 
         def stop_download():
             global should_stop_download
             should_stop_download = True
             ui.notify("\u274c Stopping download...")
 
+        def show_progress(event):
+            progress.set_value(event["fraction"])
+            progress_label.set_text(format_progress(event))
+
         async def download():
             global should_stop_download
             should_stop_download = False
@@ -188,44 +194,29 @@ with ui.tab_panels(tabs, value=config_tab).classes('w-full'):
             csv_path = Path(input_csv.value)
             out_base = Path(output_base.value)
             output_dir = out_base / csv_path.stem
-
-            rows = load_csv_rows(csv_path)
-            total = len(rows)
             progress.set_value(0)
-
-            for i, row in enumerate(rows):
-                if should_stop_download:
-                    log.push("🛑 Download stopped by user.")
-                    break
-
-                url = row["url"]
-                # Validate URL
-                if not url.startswith(('http://', 'https://')):
-                    url = f"https://{url}"
-
-                parsed = urlparse(url)
-                if 'instagram.com' not in parsed.netloc:
-                    log.push(f"⚠️ Skipping non-Instagram URL: {url}")
-
-                    continue
-
-                # Extract reel ID
-                reel_id = url.split('/')[-2] if url.endswith('/') else url.split('/')[-1]
-                log.push(f"⬇️ Downloading {reel_id}...")
-
-                try:
-                    await download_reels_from_csv(
-                        csv_path=None,  # not needed per-row
-                        output_folder=output_dir,
-                        notify=log.push,
-                        should_stop=lambda: should_stop_download,
-                        single_url=url,
-                    )
-                    log.push(f"✅ Done {reel_id}")
-                except Exception as e:
-                    log.push(f"❌ Failed {reel_id}: {e}")
-
-                progress.set_value(round(((i + 1) / total) * 100))
+            progress_label.set_text("")
+
+            budget = Budget(
+                max_bytes=(max_mb.value or 0) * 1024 * 1024 or None,
+                max_count=int(max_count.value or 0) or None,
+                max_seconds=(max_minutes.value or 0) * 60 or None,
+            )
+            try:
+                await download_reels_from_csv(
+                    csv_path=csv_path,
+                    output_folder=output_dir,
+                    notify=log.push,
+                    should_stop=lambda: should_stop_download,
+                    captures=Path(load_config().get("output_dir") or "output"),
+                    store_dir=out_base,
+                    order_by=None if order_by.value == "csv" else order_by.value,
+                    budget=budget,
+                    on_progress=show_progress,
+                )
+            except Exception as e:
+                log.push(f"❌ Download failed: {e}")
+                return
 
             if not should_stop_download:
                 ui.notify("✅ All downloads complete")
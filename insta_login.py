@@ -5,6 +5,7 @@ from playwright.async_api import async_playwright
 from pathlib import Path
 from dotenv import load_dotenv
 
+from daemon import lease_browser
 from utils import log
 
 # Load environment variables from the .env file (if present)
@@ -18,10 +19,11 @@ PASSWORD = os.getenv('PASSWORD')
 STORAGE_FILE = "insta_session.json"
 
 
-async def login_instagram(username=USERNAME, password=PASSWORD, headless=False):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=headless)
-        # Set True if you want headless
+async def login_instagram(username=USERNAME, password=PASSWORD, headless=False,
+                          storage_file=STORAGE_FILE):
+    async with async_playwright() as p, lease_browser(
+        p, lambda: p.chromium.launch(headless=headless), headless
+    ) as browser:
         context = await browser.new_context()
 
         page = await context.new_page()
@@ -31,8 +33,8 @@ async def login_instagram(username=USERNAME, password=PASSWORD, headless=False):
         await page.wait_for_selector("input[name='username']")
 
         # 💬 Fill credentials
-        await page.fill("input[name='username']", USERNAME)
-        await page.fill("input[name='password']", PASSWORD)
+        await page.fill("input[name='username']", username)
+        await page.fill("input[name='password']", password)
 
         # 🔐 Click login
         await page.click("button[type='submit']")
@@ -53,7 +55,7 @@ async def login_instagram(username=USERNAME, password=PASSWORD, headless=False):
             log(f"⚠️ 'Save Info' dialog not found. Proceeding...\nError: {e}")
         # ✅ Save session
         session_data = await context.storage_state()
-        Path(STORAGE_FILE).write_text(json.dumps(session_data))
-        log(f"✅ Session saved to {STORAGE_FILE}")
-
-        await browser.close()
+        Path(storage_file).parent.mkdir(parents=True, exist_ok=True)
+        Path(storage_file).write_text(json.dumps(session_data))
+        log(f"✅ Session saved to {storage_file}")
+        await context.close()
@@ -1,12 +1,22 @@
 import asyncio
 import json
-from datetime import datetime
+import re
+from collections import Counter
 from pathlib import Path
+from urllib.parse import urlparse
 from playwright.async_api import async_playwright
 
-from utils import log
+from capture import CaptureWriter
+from checkpoint import Checkpoint
+from daemon import lease_browser
+from reels import CLIPS_CONNECTION, get_clips_connection
+from utils import format_bytes, log
 
-response_count = 0
+# Resource types the page renders but we never keep
+BLOCKED_RESOURCES = {"image", "media", "font", "stylesheet"}
+
+# Headers that belong to the original connection, not to the query itself
+SKIPPED_HEADERS = {"cookie", "content-length", "host", "connection", "accept-encoding"}
 
 
 async def run_scraper(
@@ -16,13 +26,272 @@ async def run_scraper(
     scroll_count=20,
     scroll_delay=2,
     headless=False,
+    adaptive=False,
+    time_budget=None,
+    lean=False,
+    layout="log",
+    projection="full",
+    raw_sample=0.0,
+    resume=False,
+    incremental=False,
 ):
+    """
+    Opens the reels page and scrolls it while saving GraphQL/REST responses.
+
+    With `adaptive`, each scroll waits for the next reels page to arrive
+    (up to `scroll_delay + 2` seconds) instead of sleeping, and scrolling
+    stops early once the feed is exhausted. `time_budget` caps the whole
+    run in seconds.
+
+    With `lean`, images, video, fonts and stylesheets are aborted before they
+    download and `slow_mo` is turned off in headless mode.
+
+    `layout` picks how captures are stored and `projection` (with
+    `raw_sample`) which fields of them are kept, see `capture.CaptureWriter`.
+
+    `resume` and `incremental` use the target's checkpoint, see
+    `scrape_target`.
+
+    When the browser daemon (`daemon.py`) is running, a warm browser is
+    leased from it instead of launching one.
+    """
     async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=headless, slow_mo=100
-        )  # 👈 adds slight delay between actions
-        context = await browser.new_context(storage_state=session_file)
+        async with lease_browser(
+            p, lambda: launch_browser(p, headless, lean), headless, slow_mo(headless, lean)
+        ) as browser:
+            traffic = await scrape_target(
+                browser, url, session_file, output_dir,
+                scroll_count=scroll_count, scroll_delay=scroll_delay,
+                adaptive=adaptive, time_budget=time_budget, lean=lean, layout=layout,
+                resume=resume, incremental=incremental,
+                projection=projection, raw_sample=raw_sample,
+            )
+        log_traffic(traffic)
+        return traffic
+
+
+async def run_batch(
+    urls,
+    session_file,
+    output_dir=Path("output"),
+    concurrency=3,
+    retries=2,
+    headless=False,
+    lean=False,
+    pool=None,
+    **options,
+):
+    """
+    Scrapes many reels pages with one browser, each target in its own
+    context and saving into `output_dir/<target name>/`. Repeated URLs are
+    scraped once, see `name_targets`.
+
+    At most `concurrency` targets run at once. A failed target is retried
+    on its own up to `retries` times, without affecting the others.
+    `options` are passed to `scrape_target`.
+
+    With a `pool` (`sessions.SessionPool`), every attempt takes a session
+    from it instead of `session_file`, and a session that gets rate-limited
+    is quarantined and the target retried with another one.
+    """
+    semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+    results = {}
+    targets = name_targets(urls)
+    if len(targets) < len(urls):
+        log(f"🔁 Skipping {len(urls) - len(targets)} duplicate targets")
+
+    async with async_playwright() as p:
+        shared = SharedBrowser(p, headless, lean)
+
+        async def run_target(url, name):
+            target_dir = Path(output_dir) / name
+            target_dir.mkdir(parents=True, exist_ok=True)
+            for attempt in range(1, retries + 2):
+                async with semaphore:
+                    try:
+                        session = await pool.acquire() if pool else session_file
+                        if session is None:
+                            raise RuntimeError("no usable session in the pool")
+                        traffic = await scrape_target(
+                            await shared.get(), url, session, target_dir,
+                            lean=lean, name=name, **options,
+                        )
+                        if pool and pool.quarantine_if_limited(session, traffic):
+                            raise RuntimeError(f"rate-limited on {Path(session).name}")
+                        results[url] = "done"
+                        log(f"✅ [{name}] Finished ({format_bytes(traffic['bytes'])})")
+                        return
+                    except Exception as e:
+                        results[url] = "failed"
+                        log(f"❌ [{name}] Attempt {attempt} failed: {e}")
+                if attempt <= retries:
+                    await asyncio.sleep(5 * attempt)
+
+        await asyncio.gather(*(run_target(url, name) for url, name in targets.items()))
+        await shared.close()
+
+    failed = [url for url, status in results.items() if status == "failed"]
+    log(f"📊 Targets done: {len(results) - len(failed)}/{len(results)}")
+    for url in failed:
+        log(f"• Failed: {url}")
+    return results
+
+
+class SharedBrowser:
+    """
+    One browser shared by concurrent scrapes, launched on first use and
+    relaunched when it has crashed, since a dead browser would fail every
+    remaining target.
+    """
+
+    def __init__(self, p, headless=False, lean=False):
+        self.p = p
+        self.headless = headless
+        self.lean = lean
+        self.browser = None
+        self.lock = asyncio.Lock()
+
+    async def get(self):
+        async with self.lock:
+            if self.browser is None or not self.browser.is_connected():
+                if self.browser is not None:
+                    log("♻️ Browser disconnected, relaunching...")
+                self.browser = await launch_browser(self.p, self.headless, self.lean)
+        return self.browser
+
+    async def close(self):
+        if self.browser is not None:
+            await self.browser.close()
+
+
+async def launch_browser(p, headless=False, lean=False):
+    return await p.chromium.launch(
+        headless=headless, slow_mo=slow_mo(headless, lean)
+    )
+
+
+def slow_mo(headless=False, lean=False):
+    # 👈 adds slight delay between actions
+    return 0 if lean and headless else 100
+
+
+def target_name(url):
+    """Folder name for a target, e.g. `instagram.com/nasa/reels/` -> `nasa`."""
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    parts = [part for part in parsed.path.split("/") if part]
+    name = parts[0] if parts else parsed.netloc
+    return re.sub(r"[^\w.-]", "_", name) or "target"
+
+
+def normalize_target(url):
+    """`url` with a scheme, lowercase host and one trailing slash, without query or fragment."""
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    netloc = parsed.netloc.lower()
+    if netloc == "instagram.com":
+        netloc = "www.instagram.com"
+    return f"{parsed.scheme or 'https'}://{netloc}{parsed.path.rstrip('/')}/"
+
+
+def name_targets(urls):
+    """
+    Maps each distinct target, normalized, to its folder name. Targets whose
+    names clash (such as `/nasa/` and `/nasa/reels/`) get `-2`, `-3`, ...
+    so they never share an output folder or checkpoint.
+    """
+    targets = {}
+    taken = set()
+    for url in map(normalize_target, urls):
+        if url in targets:
+            continue
+        base = name = target_name(url)
+        count = 1
+        while name in taken:
+            count += 1
+            name = f"{base}-{count}"
+        taken.add(name)
+        targets[url] = name
+    return targets
+
+
+async def scrape_target(
+    browser,
+    url,
+    session_file,
+    output_dir=Path("output"),
+    scroll_count=20,
+    scroll_delay=2,
+    adaptive=False,
+    time_budget=None,
+    lean=False,
+    layout="log",
+    projection="full",
+    raw_sample=0.0,
+    name=None,
+    resume=False,
+    incremental=False,
+):
+    """
+    Scrapes one reels page in a fresh context of an already running browser.
+    Returns the traffic and writer counters of the run.
+
+    Progress is saved to the target's checkpoint (`checkpoint.Checkpoint`)
+    after every reels page. With `resume`, a target that has a saved cursor
+    continues from it over HTTP (`replay.replay_pages`) without opening the
+    page; `scroll_count` then caps the pages fetched. With `incremental`,
+    scrolling stops at the first page holding reels seen in an earlier run.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + float(time_budget) if time_budget else None
+    pending = set()
+
+    def time_left():
+        return deadline - loop.time() if deadline else None
+
+    def say(msg):
+        log(f"[{name}] {msg}" if name else msg)
+
+    checkpoint = Checkpoint(output_dir)
+    if resume:
+        if checkpoint.can_resume:
+            from replay import replay_pages
+            say(f"⏩ Resuming after {checkpoint.scrolls} scrolls from the saved cursor")
+            saved = await replay_pages(
+                checkpoint.template, session_file, output_dir,
+                max_pages=scroll_count, page_delay=scroll_delay, layout=layout,
+                cursor=checkpoint.end_cursor, checkpoint=checkpoint,
+                incremental=incremental, projection=projection, raw_sample=raw_sample,
+            )
+            checkpoint.report(say)
+            return Counter(pages=saved)
+        if not checkpoint.has_next_page and not incremental:
+            say("🏁 Checkpoint is already at the end of the feed.")
+            return Counter()
+        say("⚠️ No saved cursor to resume from, starting from the top.")
+
+    checkpoint.start_from_top(incremental)
+    caught_up = asyncio.Event()
+    template_saved = False
+
+    context = await browser.new_context(storage_state=session_file)
+    writer = CaptureWriter(
+        output_dir, layout=layout, projection=projection, raw_sample=raw_sample
+    )
+    traffic = Counter()
+    counting = set()
+
+    def on_request_finished(request):
+        # Kept referenced until done, and awaited while the context is open
+        task = asyncio.create_task(count_bytes(request, traffic))
+        counting.add(task)
+        task.add_done_callback(counting.discard)
+
+    await writer.start()
+    try:
+        if lean:
+            await context.route("**/*", lambda route: block_heavy(route, traffic))
         page = await context.new_page()
+        page.on("requestfinished", on_request_finished)  # type: ignore
 
         # ✅ Log and hook into all GraphQL requests and responses
         def is_graphql_response(res):
@@ -36,52 +305,170 @@ async def run_scraper(
                 '/api/v1/clips/music'
             ])
 
-        page.on(
-            "response",
-            lambda response: asyncio.create_task(handle_response(
-                response, output_dir)
-            )
-            if is_relevant_response(response)
-            else None,
-        )  # type: ignore
+        reels_pages = asyncio.Queue()
+
+        async def capture(response):
+            nonlocal template_saved
+            data = await handle_response(response, writer)
+            if not data or CLIPS_CONNECTION not in (data.get("data") or {}):
+                return
+            connection = get_clips_connection(data)
+            if not template_saved:
+                template_saved = True
+                checkpoint.template = await request_template(response.request)
+            if checkpoint.observe(connection) and incremental:
+                caught_up.set()
+            await checkpoint.autosave()
+            if adaptive:
+                reels_pages.put_nowait(connection)
+
+        def on_response(response):
+            if response.status == 429:
+                traffic["rate_limited"] += 1
+            if is_relevant_response(response):
+                task = asyncio.create_task(capture(response))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+        page.on("response", on_response)  # type: ignore
 
-        log(f"🔗 Navigating to: {url}")
+        say(f"🔗 Navigating to: {url}")
         await page.goto(url, wait_until="domcontentloaded")
 
         # ⚠️ Let Instagram initialize its data
-        await asyncio.sleep(5)
+        if adaptive:
+            reels_page = await next_reels_page(reels_pages, capped_timeout(10, time_left()))
+        else:
+            await asyncio.sleep(capped_timeout(5, time_left()))
 
-        log("📜 Scrolling and watching for requests...")
+        say("📜 Scrolling and watching for requests...")
         for i in range(int(scroll_count)):
+            if caught_up.is_set():
+                say("🔁 Reached reels from a previous run, stopping.")
+                break
+            if adaptive and reels_page is not None and is_last_page(reels_page):
+                say("🏁 Reached the end of the feed.")
+                break
+            if deadline and time_left() <= 0:
+                say("⏰ Time budget used up, stopping.")
+                break
+
             await page.evaluate(
                 "window.scrollBy(0, document.body.scrollHeight)"
             )
-            log(f"↕️ Scrolled ({i+1}/{scroll_count})")
-            await asyncio.sleep(scroll_delay + 2)
-            # ⏳ wait longer to let queries fire
+            checkpoint.count_scroll()
+            say(f"↕️ Scrolled ({i+1}/{scroll_count})")
+            if adaptive:
+                # ⏳ scroll again as soon as the next page of reels arrives
+                timeout = capped_timeout(scroll_delay + 2, time_left())
+                reels_page = await next_reels_page(reels_pages, timeout)
+                if reels_page is None:
+                    # The wait is cut short by the budget, so that is no sign of the end
+                    if deadline and time_left() <= 0:
+                        say("⏰ Time budget used up, stopping.")
+                    else:
+                        say("🏁 No new reels loaded, assuming end of the feed.")
+                    break
+            else:
+                await asyncio.sleep(capped_timeout(scroll_delay + 2, time_left()))
+                # ⏳ wait longer to let queries fire
+
+        if adaptive:
+            say("✅ Done scrolling. Waiting for pending saves...")
+        else:
+            say("✅ Done scrolling. Waiting for any final GraphQL responses...")
+            await asyncio.sleep(capped_timeout(10, time_left()))
+
+        # Responses still being read need the context open
+        if pending:
+            await asyncio.wait(pending, timeout=capped_timeout(10, time_left()))
+        if pending:
+            say(f"⚠️ {len(pending)} responses still loading, dropping them.")
+        if counting:
+            await asyncio.wait(counting, timeout=5)
+    finally:
+        # Nothing may put into the writer once it is closed
+        leftover = pending | counting
+        for task in leftover:
+            task.cancel()
+        await asyncio.gather(*leftover, return_exceptions=True)
+        await writer.close()
+        await context.close()
+        checkpoint.save()
+    writer.report()
+    checkpoint.report(say)
+    traffic.update(writer.stats)
+    return traffic
+
+
+async def block_heavy(route, traffic):
+    kind = route.request.resource_type
+    if kind in BLOCKED_RESOURCES:
+        traffic[f"blocked_{kind}"] += 1
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def count_bytes(request, traffic):
+    try:
+        sizes = await request.sizes()
+        traffic["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        traffic["requests"] += 1
+    except Exception:
+        pass
+
+
+def log_traffic(traffic):
+    log(f"📶 Downloaded {format_bytes(traffic['bytes'])} in {traffic['requests']} requests")
+    log_blocked(traffic)
+
+
+def log_blocked(traffic):
+    blocked = {k[len("blocked_"):]: v for k, v in traffic.items() if k.startswith("blocked_")}
+    if blocked:
+        details = ", ".join(f"{kind}: {count}" for kind, count in sorted(blocked.items()))
+        log(f"🧹 Blocked {sum(blocked.values())} requests ({details})")
+
+
+def capped_timeout(seconds, time_left):
+    if time_left is None:
+        return seconds
+    return max(0, min(seconds, time_left))
+
+
+async def next_reels_page(reels_pages, timeout):
+    try:
+        return await asyncio.wait_for(reels_pages.get(), timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def is_last_page(connection):
+    page_info = connection.get("page_info") or {}
+    return not connection.get("edges") or page_info.get("has_next_page") is False
 
-        log("✅ Done scrolling. Waiting for any final GraphQL responses...")
-        await asyncio.sleep(10)
 
-        await browser.close()
-        log(f"💾 Total responses saved: {response_count}")
+async def request_template(request):
+    """The parts of a reels GraphQL request needed to send it again over HTTP."""
+    return {
+        "url": request.url,
+        "method": request.method,
+        "headers": {
+            k: v for k, v in (await request.all_headers()).items()
+            if not k.startswith(":") and k.lower() not in SKIPPED_HEADERS
+        },
+        "post_data": request.post_data,
+    }
 
 
-async def handle_response(response, output_dir):
-    global response_count
+async def handle_response(response, writer):
     try:
         if response.status != 200:
             return
-        data = await response.json()
-        timestamp = int(datetime.now().timestamp() * 1000)
-        if "graphql" in response.url:
-            filename = output_dir / f"graphql_{timestamp}.json"
-        elif "clips/music" in response.url:
-            filename = output_dir / f"rest_{timestamp}.json"
-
-        with open(filename, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
-        response_count += 1
-        log(f"📦 Saved: {filename.name}")
+        body = await response.body()
+        data = json.loads(body)
+        await writer.put(data, response.url, len(body))
+        return data
     except Exception as e:
-        log(f"❌ Error saving response: {e}")
+        log(f"❌ Error reading response: {e}")
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import time
+
+from utils import log
+
+QUEUE_FILE = "jobs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    target TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    available_at REAL NOT NULL,
+    error TEXT,
+    created_at REAL NOT NULL,
+    finished_at REAL,
+    UNIQUE (kind, target)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Job kinds and states
+SCRAPE, DOWNLOAD = "scrape", "download"
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def connect(db_path=QUEUE_FILE):
+    """
+    Opens (and creates if needed) the job queue. Workers on other hosts can
+    share it over a network folder as long as it supports file locks.
+    """
+    # Autocommit, transactions are opened explicitly with BEGIN IMMEDIATE
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # Not WAL: its shared-memory index does not work across hosts on a network folder
+    conn.execute("PRAGMA journal_mode=DELETE")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def add(conn, kind, target, options=None, max_attempts=3):
+    """
+    Queues a job. Adding a target that is already queued or running does
+    nothing; a finished or failed one is queued again with fresh attempts.
+    Returns True when the job was (re)queued.
+    """
+    now = time.time()
+    cursor = conn.execute(
+        """
+        INSERT INTO jobs (kind, target, options, status, max_attempts, available_at, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (kind, target) DO UPDATE SET
+            options = excluded.options, status = excluded.status, attempts = 0,
+            max_attempts = excluded.max_attempts, worker = NULL, lease_until = NULL,
+            available_at = excluded.available_at, error = NULL, finished_at = NULL
+        WHERE jobs.status IN (?, ?)
+        """,
+        (kind, target, json.dumps(options or {}), QUEUED, max_attempts, now, now, DONE, FAILED),
+    )
+    return cursor.rowcount > 0
+
+
+def targets(conn, kind):
+    """Targets of every `kind` job ever queued, oldest first."""
+    rows = conn.execute("SELECT target FROM jobs WHERE kind = ? ORDER BY id", (kind,))
+    return [row["target"] for row in rows]
+
+
+def requeue_expired(conn, now=None):
+    """
+    Hands jobs whose worker stopped heartbeating back to the queue, or fails
+    them when they are out of attempts.
+    """
+    now = now or time.time()
+    conn.execute(
+        """
+        UPDATE jobs SET
+            status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+            error = 'lease expired on ' || worker, worker = NULL, lease_until = NULL,
+            finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END
+        WHERE status = ? AND lease_until < ?
+        """,
+        (QUEUED, FAILED, now, RUNNING, now),
+    )
+
+
+def claim(conn, worker, lease_seconds=120, kinds=None):
+    """
+    Leases the oldest available job to `worker` and counts it as an
+    attempt. Returns the job row, or None when nothing is available.
+    """
+    now = time.time()
+    kinds = kinds or (SCRAPE, DOWNLOAD)
+    # BEGIN IMMEDIATE takes the write lock first, so two workers never claim the same job
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        requeue_expired(conn, now)
+        row = conn.execute(
+            f"""
+            SELECT id FROM jobs
+            WHERE status = ? AND available_at <= ? AND kind IN ({",".join("?" * len(kinds))})
+            ORDER BY available_at, id LIMIT 1
+            """,
+            (QUEUED, now, *kinds),
+        ).fetchone()
+        if row:
+            conn.execute(
+                """
+                UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (RUNNING, worker, now + lease_seconds, row["id"]),
+            )
+        seen(conn, worker, now)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    if row:
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+    return None
+
+
+def seen(conn, worker, now=None, done=0, failed=0):
+    now = now or time.time()
+    conn.execute(
+        """
+        INSERT INTO workers (name, started_at, last_seen, done, failed) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (name) DO UPDATE SET
+            last_seen = excluded.last_seen, done = done + excluded.done,
+            failed = failed + excluded.failed
+        """,
+        (worker, now, now, done, failed),
+    )
+
+
+def heartbeat(conn, job_id, worker, lease_seconds=120):
+    """Extends the lease. False when the job was taken back from `worker`."""
+    now = time.time()
+    cursor = conn.execute(
+        "UPDATE jobs SET lease_until = ? WHERE id = ? AND worker = ? AND status = ?",
+        (now + lease_seconds, job_id, worker, RUNNING),
+    )
+    seen(conn, worker, now)
+    return cursor.rowcount > 0
+
+
+def complete(conn, job_id, worker):
+    now = time.time()
+    conn.execute(
+        """
+        UPDATE jobs SET status = ?, lease_until = NULL, error = NULL, finished_at = ?
+        WHERE id = ? AND worker = ? AND status = ?
+        """,
+        (DONE, now, job_id, worker, RUNNING),
+    )
+    seen(conn, worker, now, done=1)
+
+
+def fail(conn, job_id, worker, error, backoff=30):
+    """
+    Records a failed attempt. The job is queued again after `backoff`
+    seconds per attempt so far, or marked failed once out of attempts.
+    """
+    now = time.time()
+    conn.execute(
+        """
+        UPDATE jobs SET
+            status = CASE WHEN attempts < max_attempts THEN ? ELSE ? END,
+            available_at = ? + ? * attempts, lease_until = NULL, error = ?,
+            finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END
+        WHERE id = ? AND worker = ? AND status = ?
+        """,
+        (QUEUED, FAILED, now, backoff, error, now, job_id, worker, RUNNING),
+    )
+    seen(conn, worker, now, failed=1)
+
+
+def release(conn, job_id, worker):
+    """Puts a running job back in the queue without using up an attempt."""
+    conn.execute(
+        """
+        UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL,
+            attempts = MAX(attempts - 1, 0)
+        WHERE id = ? AND worker = ? AND status = ?
+        """,
+        (QUEUED, job_id, worker, RUNNING),
+    )
+
+
+def retry_failed(conn):
+    """Queues every failed job again with fresh attempts. Returns how many."""
+    cursor = conn.execute(
+        """
+        UPDATE jobs SET status = ?, attempts = 0, available_at = ?, finished_at = NULL
+        WHERE status = ?
+        """,
+        (QUEUED, time.time(), FAILED),
+    )
+    return cursor.rowcount
+
+
+def status(conn, window=600):
+    """
+    Queue depth by kind and state, plus per-worker throughput over the
+    last `window` seconds.
+    """
+    now = time.time()
+    with conn:
+        requeue_expired(conn, now)
+    depth = {}
+    for row in conn.execute("SELECT kind, status, COUNT(*) AS n FROM jobs GROUP BY kind, status"):
+        depth.setdefault(row["kind"], {})[row["status"]] = row["n"]
+    recent = {
+        row["worker"]: row["n"]
+        for row in conn.execute(
+            """
+            SELECT worker, COUNT(*) AS n FROM jobs
+            WHERE status = ? AND finished_at >= ? GROUP BY worker
+            """,
+            (DONE, now - window),
+        )
+    }
+    workers = []
+    for row in conn.execute("SELECT * FROM workers ORDER BY last_seen DESC"):
+        running = conn.execute(
+            "SELECT kind, target FROM jobs WHERE worker = ? AND status = ?", (row["name"], RUNNING)
+        ).fetchone()
+        workers.append({
+            "name": row["name"],
+            "idle_s": round(now - row["last_seen"]),
+            "done": row["done"],
+            "failed": row["failed"],
+            "per_min": recent.get(row["name"], 0) / (window / 60),
+            "running": f"{running['kind']} {running['target']}" if running else None,
+        })
+    return {"depth": depth, "workers": workers, "window": window}
+
+
+def format_status(report, stale=60):
+    lines = ["📋 Queue:"]
+    if not report["depth"]:
+        lines.append("• empty")
+    for kind, counts in sorted(report["depth"].items()):
+        states = ", ".join(
+            f"{counts.get(state, 0)} {state}" for state in (QUEUED, RUNNING, DONE, FAILED)
+        )
+        lines.append(f"• {kind}: {states}")
+    active = [worker for worker in report["workers"] if worker["idle_s"] <= stale]
+    total = sum(worker["per_min"] for worker in active)
+    lines.append(
+        f"👷 Workers: {len(active)} active, {total:.1f} jobs/min over the last "
+        f"{report['window'] // 60} min"
+    )
+    for worker in active:
+        doing = worker["running"] or "idle"
+        lines.append(
+            f"• {worker['name']}: {worker['per_min']:.1f}/min, {worker['done']} done, "
+            f"{worker['failed']} failed, {doing}"
+        )
+    return lines
+
+
+async def run_worker(db_path, handlers, worker=None, lease_seconds=120, poll_seconds=5,
+                     max_jobs=None, exit_when_empty=False, should_stop=None, backoff=30):
+    """
+    Claims jobs from the queue and runs them with `handlers[kind](job, options)`
+    until stopped. While a job runs its lease is renewed every third of
+    `lease_seconds`; a worker that dies stops renewing it, and the job goes
+    back to the queue once the lease expires. A job whose lease was taken
+    back is cancelled, a failed one is retried after `backoff` seconds per
+    attempt. Returns the number of jobs done.
+    """
+    worker = worker or worker_name()
+    conn = connect(db_path)
+    done = 0
+    log(f"👷 Worker {worker} started")
+    try:
+        while not (should_stop and should_stop()) and (max_jobs is None or done < max_jobs):
+            job = claim(conn, worker, lease_seconds, kinds=tuple(handlers))
+            if job is None:
+                if exit_when_empty and not pending(conn, tuple(handlers)):
+                    break
+                await asyncio.sleep(poll_seconds)
+                continue
+
+            label = f"[{job['kind']} #{job['id']}] {job['target']}"
+            log(f"▶️ {label} (attempt {job['attempts']}/{job['max_attempts']})")
+            task = asyncio.create_task(handlers[job["kind"]](job, json.loads(job["options"])))
+            lost = False
+            try:
+                while not task.done():
+                    await asyncio.wait({task}, timeout=lease_seconds / 3)
+                    if not task.done() and not heartbeat(conn, job["id"], worker, lease_seconds):
+                        lost = True
+                        task.cancel()
+                await task
+            except asyncio.CancelledError:
+                if lost:
+                    log(f"⚠️ {label} lease lost, left to another worker")
+                    continue
+                # Stopped from outside (Ctrl+C): hand the job back right away
+                task.cancel()
+                release(conn, job["id"], worker)
+                raise
+            except Exception as e:
+                fail(conn, job["id"], worker, f"{type(e).__name__}: {e}", backoff)
+                log(f"❌ {label} failed: {e}")
+            else:
+                complete(conn, job["id"], worker)
+                done += 1
+                log(f"✅ {label} done")
+    finally:
+        conn.close()
+    log(f"👷 Worker {worker} stopped after {done} jobs")
+    return done
+
+
+def pending(conn, kinds=(SCRAPE, DOWNLOAD)):
+    """Jobs of `kinds` that are queued (now or after a backoff) or still running."""
+    row = conn.execute(
+        f"""
+        SELECT COUNT(*) AS n FROM jobs
+        WHERE status IN (?, ?) AND kind IN ({",".join("?" * len(kinds))})
+        """,
+        (QUEUED, RUNNING, *kinds),
+    ).fetchone()
+    return row["n"]
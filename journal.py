@@ -0,0 +1,86 @@
+import sqlite3
+import time
+
+JOURNAL_FILE = "downloads.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    reel_id TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    path TEXT,
+    bytes INTEGER,
+    sha256 TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS downloads_status ON downloads (status);
+"""
+
+# Download states recorded in the journal
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+
+def connect(db_path):
+    """Opens (and creates if needed) the download journal at `db_path`."""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def entries(conn):
+    """{reel_id: row} of the whole journal, read once per run."""
+    return {row["reel_id"]: row for row in conn.execute("SELECT * FROM downloads")}
+
+
+def start(conn, reel_id, url, path):
+    """Records a new attempt at downloading `reel_id` into `path`."""
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO downloads (reel_id, url, status, path, attempts, updated_at)
+            VALUES (?, ?, ?, ?, 1, ?)
+            ON CONFLICT (reel_id) DO UPDATE SET
+                url = excluded.url, status = excluded.status, path = excluded.path,
+                attempts = attempts + 1, error = NULL, updated_at = excluded.updated_at
+            """,
+            (reel_id, url, PENDING, str(path), time.time()),
+        )
+
+
+def finish(conn, reel_id, url, path, size, sha256):
+    with conn:
+        conn.execute(
+            """
+            INSERT INTO downloads (reel_id, url, status, path, bytes, sha256, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (reel_id) DO UPDATE SET
+                url = excluded.url, status = excluded.status, path = excluded.path,
+                bytes = excluded.bytes, sha256 = excluded.sha256, error = NULL,
+                updated_at = excluded.updated_at
+            """,
+            (reel_id, url, DONE, str(path), size, sha256, time.time()),
+        )
+
+
+def fail(conn, reel_id, error):
+    with conn:
+        conn.execute(
+            "UPDATE downloads SET status = ?, error = ?, updated_at = ? WHERE reel_id = ?",
+            (FAILED, error, time.time(), reel_id),
+        )
+
+
+def summary(conn):
+    """{status: count} over the whole journal."""
+    rows = conn.execute("SELECT status, COUNT(*) AS n FROM downloads GROUP BY status")
+    return {row["status"]: row["n"] for row in rows}
+
+
+def forget(conn, sha256s):
+    """Drops the entries of deleted blobs so their reels are fetched again."""
+    with conn:
+        conn.executemany("DELETE FROM downloads WHERE sha256 = ?", ((sha,) for sha in sha256s))
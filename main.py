@@ -5,9 +5,11 @@ import json
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from insta_login import login_instagram
+from insta_login import STORAGE_FILE, login_instagram
 from intrecept import run_scraper
-from reels import load_all_data, write_csv
+from sessions import SessionPool
+import store
+from reels import CSV_FIELDS, load_all_data, write_csv
 
 CONFIG_FILE = Path(".scraper_config.json")
 
@@ -38,6 +40,83 @@ def load_credentials():
     return username, password
 
 
+async def get_session(pool, headless=False):
+    """A working session from the pool, logging in with .env when there is none."""
+    session_file = await pool.acquire()
+    if session_file is None:
+        print("🔑 No usable session, logging in...")
+        username, password = load_credentials()
+        await login_instagram(username, password, headless=headless)
+        session_file = Path(STORAGE_FILE)
+    return session_file
+
+
+async def scrape_job(job, options, pool, config):
+    """
+    Queue handler: scrapes `job["target"]` into `<output folder>/<name>/`,
+    the folder name picked when the job was queued.
+    """
+    from intrecept import target_name
+    name = options.pop("name", None) or target_name(job["target"])
+    session_file = await get_session(pool, headless=config.get("headless"))
+    traffic = await run_scraper(
+        url=job["target"],
+        session_file=session_file,
+        output_dir=Path(config.get("output_dir") or "output") / name,
+        scroll_count=config["scroll_count"],
+        scroll_delay=config["scroll_delay"],
+        headless=config["headless"],
+        **options,
+    )
+    if pool.quarantine_if_limited(session_file, traffic):
+        raise RuntimeError(f"rate-limited on {Path(session_file).name}")
+
+
+async def download_job(job, options, config):
+    """Queue handler: downloads the reels of the CSV in `job["target"]`."""
+    from downloader import download_reels_from_csv
+    csv_path = Path(job["target"])
+    output_base = Path(options.pop("output", "downloads"))
+    captures = options.pop("captures", None) or config.get("output_dir")
+    results = await download_reels_from_csv(
+        csv_path=csv_path,
+        output_folder=output_base / csv_path.stem,
+        store_dir=output_base,
+        captures=Path(captures) if captures else None,
+        **options,
+    )
+    if results is None:
+        raise RuntimeError(f"no rows in {csv_path}")
+    if results["failed"]:
+        # Done reels are skipped through the journal, so a retry only fetches the rest
+        raise RuntimeError(f"{results['failed']} reels failed")
+
+
+def read_targets(targets, file=None):
+    """Targets given as arguments, plus one per line of `file` (`#` lines are skipped)."""
+    targets = list(targets)
+    if file:
+        lines = Path(file).read_text(encoding="utf-8").splitlines()
+        targets += [line.strip() for line in lines if line.strip() and not line.startswith("#")]
+    return targets
+
+
+def positive_float(value):
+    """argparse type for rates and other values that must be above zero."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def positive_int(value):
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
 def save_config(config):
     with open(CONFIG_FILE, "w") as f:
         json.dump(config, f, indent=2)
@@ -71,21 +150,184 @@ def main():
     subparsers.add_parser("config", help="Setup scraper configuration interactively")
 
     # Command: login
-    subparsers.add_parser("login", help="Login using credentials in .env and save session")
+    login_parser = subparsers.add_parser(
+        "login", help="Login using credentials in .env and save session"
+    )
+    login_parser.add_argument(
+        "--save-as",
+        default=STORAGE_FILE,
+        help=f"Session file to write, e.g. sessions/alt.json to add an account to the pool "
+             f"[default: {STORAGE_FILE}]"
+    )
+
+    # Command: sessions
+    subparsers.add_parser(
+        "sessions", help="Check every session in the pool and show its status"
+    )
+
+    # Options shared by scrape and batch
+    scrape_options = argparse.ArgumentParser(add_help=False)
+    scrape_options.add_argument(
+        "-a", "--adaptive",
+        action="store_true",
+        help="Scroll as soon as each reels page arrives and stop at the end of the feed"
+    )
+    scrape_options.add_argument(
+        "-t", "--time-budget",
+        type=float,
+        default=None,
+        help="Stop scrolling after this many seconds"
+    )
+    scrape_options.add_argument(
+        "-l", "--lean",
+        action="store_true",
+        help="Block images, video, fonts and stylesheets while scraping"
+    )
+    scrape_options.add_argument(
+        "--capture-format",
+        choices=["log", "files"],
+        default="log",
+        help="Store responses in compressed capture logs, or one JSON file each (legacy) "
+             "[default: log]"
+    )
+    scrape_options.add_argument(
+        "--projection",
+        choices=["full", "minimal"],
+        default="full",
+        help="Keep whole responses, or only the media fields extract and download use "
+             "[default: full]"
+    )
+    scrape_options.add_argument(
+        "--raw-sample",
+        type=float,
+        default=0.0,
+        help="Fraction of responses kept whole anyway with --projection minimal, for debugging"
+    )
+    scrape_options.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue from the cursor saved in the output folder's checkpoint"
+    )
+    scrape_options.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Stop at the first page of reels already seen in a previous run"
+    )
 
     # Command: scrape
-    subparsers.add_parser("scrape", help="Scrape Instagram Reels using saved session and config")
+    scrape_parser = subparsers.add_parser(
+        "scrape", parents=[scrape_options],
+        help="Scrape Instagram Reels using saved session and config"
+    )
+    scrape_parser.add_argument(
+        "-r", "--replay",
+        action="store_true",
+        help="Capture the first reels request in the browser, then page through it over HTTP"
+    )
+    scrape_parser.add_argument(
+        "-p", "--max-pages",
+        type=int,
+        default=100,
+        help="Max pages fetched in replay mode [default: 100]"
+    )
+
+    # Command: batch
+    batch_parser = subparsers.add_parser(
+        "batch", parents=[scrape_options],
+        help="Scrape many reels URLs with one browser, one subfolder per target"
+    )
+    batch_parser.add_argument(
+        "urls",
+        nargs="*",
+        help="Reels URLs to scrape"
+    )
+    batch_parser.add_argument(
+        "-f", "--file",
+        help="Text file with one reels URL per line"
+    )
+    batch_parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=3,
+        help="Number of targets scraped at the same time [default: 3]"
+    )
+    batch_parser.add_argument(
+        "--rotate",
+        choices=["lru", "round-robin"],
+        default="lru",
+        help="How sessions from the pool are assigned to targets [default: lru]"
+    )
+    batch_parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Retries for each failed target [default: 2]"
+    )
 
     # Command: extract
     extract_parser = subparsers.add_parser("extract", help="Convert saved JSONs to summarized CSV")
     config = load_config()
     output_file = config.get('output_dir') + '.csv' if config.get('output_dir') else "reels_summary.csv" # noqa E501
 
+    extract_parser.add_argument(
+        "-i", "--input",
+        default=None,
+        help="Folder with saved responses, e.g. output/<target> after a batch "
+             "[default: config output folder]"
+    )
     extract_parser.add_argument(
         "-o", "--output",
         default=output_file,
         help="Output CSV filename"
     )
+    extract_parser.add_argument(
+        "--full-rebuild",
+        action="store_true",
+        help="Ignore the extract cache and re-parse every capture"
+    )
+    extract_parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=1,
+        help="Processes used to parse captures, 0 for one per CPU [default: 1]"
+    )
+    extract_parser.add_argument(
+        "--db",
+        default=None,
+        help="SQLite metrics store [default: <input folder>/reels.db]"
+    )
+    extract_parser.add_argument(
+        "-g", "--gained",
+        type=float,
+        default=None,
+        metavar="HOURS",
+        help="Sort by plays gained over the last HOURS and add a plays_gained column"
+    )
+    extract_parser.add_argument(
+        "-f", "--format",
+        choices=["csv", "parquet", "arrow"],
+        default="csv",
+        help="Output format; parquet/arrow keep raw counts and need pyarrow [default: csv]"
+    )
+    extract_parser.add_argument(
+        "-n", "--top",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Only keep the first N reels in the chosen order"
+    )
+    extract_parser.add_argument(
+        "-s", "--stream",
+        action="store_true",
+        help="Stream captures straight to the CSV with bounded memory "
+             "(no cache or metrics store)"
+    )
+    extract_parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=200_000,
+        help="Rows kept in memory per sorted run in --stream mode [default: 200000]"
+    )
     extract_parser.add_argument(
         "-sbp", "--sort-by-plays",
         action="store_true",
@@ -117,6 +359,254 @@ def main():
         default="downloads",
         help="Base output folder to save downloaded videos"
     )
+    download_parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=1,
+        help="Number of reels downloaded at the same time [default: 1]"
+    )
+    download_parser.add_argument(
+        "-r", "--rate",
+        type=positive_float,
+        default=None,
+        help="Max downloads started per second across all workers "
+             "[default: random 1-2.5s pause per download]"
+    )
+    download_parser.add_argument(
+        "--order-by",
+        choices=["plays", "likes", "engagement"],
+        default=None,
+        help="Download the highest rows by this metric first [default: CSV order]"
+    )
+    download_parser.add_argument(
+        "--max-mb",
+        type=float,
+        default=None,
+        help="Stop after downloading this many megabytes"
+    )
+    download_parser.add_argument(
+        "--max-count",
+        type=int,
+        default=None,
+        help="Stop after downloading this many new reels"
+    )
+    download_parser.add_argument(
+        "--max-minutes",
+        type=float,
+        default=None,
+        help="Stop taking new reels after this many minutes"
+    )
+    download_parser.add_argument(
+        "--retries",
+        type=positive_int,
+        default=3,
+        help="Attempts per reel, with backoff between failed ones [default: 3]"
+    )
+    download_parser.add_argument(
+        "--captures",
+        default=None,
+        help="Capture folder whose video URLs are downloaded directly, "
+             "falling back to yt-dlp [default: config output folder]"
+    )
+    download_parser.add_argument(
+        "--rendition",
+        default="best",
+        help="Video rendition for direct downloads: best, worst or a max height "
+             "such as 720 [default: best]"
+    )
+
+    # Command: gc
+    gc_parser = subparsers.add_parser(
+        "gc", help="Delete stored videos that no download folder links to anymore"
+    )
+    gc_parser.add_argument(
+        "-o", "--output",
+        default="downloads",
+        help="Base download folder holding the blob store [default: downloads]"
+    )
+    gc_parser.add_argument(
+        "-n", "--dry-run",
+        action="store_true",
+        help="Only report what would be deleted"
+    )
+
+    # Command: watch
+    watch_parser = subparsers.add_parser(
+        "watch", help="Re-scrape profiles on intervals that adapt to how active each one is"
+    )
+    watch_parser.add_argument(
+        "urls",
+        nargs="*",
+        help="Reels URLs to watch"
+    )
+    watch_parser.add_argument(
+        "-f", "--file",
+        help="Text file with one reels URL per line"
+    )
+    watch_parser.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=2,
+        help="Profiles scraped at the same time [default: 2]"
+    )
+    watch_parser.add_argument(
+        "--per-hour",
+        type=float,
+        default=30,
+        help="Most passes started per hour over all profiles [default: 30]"
+    )
+    watch_parser.add_argument(
+        "--start-minutes",
+        type=float,
+        default=60,
+        help="Interval of a profile before it adapts [default: 60]"
+    )
+    watch_parser.add_argument(
+        "--min-minutes",
+        type=float,
+        default=15,
+        help="Shortest interval between passes of a profile [default: 15]"
+    )
+    watch_parser.add_argument(
+        "--max-minutes",
+        type=float,
+        default=1440,
+        help="Longest interval between passes of a profile [default: 1440]"
+    )
+    watch_parser.add_argument(
+        "--passes",
+        type=int,
+        default=None,
+        help="Stop after this many passes per profile [default: run until stopped]"
+    )
+    watch_parser.add_argument(
+        "-a", "--adaptive",
+        action="store_true",
+        help="Scroll as soon as each reels page arrives and stop at the end of the feed"
+    )
+    watch_parser.add_argument(
+        "-l", "--lean",
+        action="store_true",
+        help="Block images, video, fonts and stylesheets while scraping"
+    )
+    watch_parser.add_argument(
+        "--projection",
+        choices=["full", "minimal"],
+        default="full",
+        help="Keep whole responses, or only the media fields extract and download use "
+             "[default: full]"
+    )
+
+    # Command: daemon
+    daemon_parser = subparsers.add_parser(
+        "daemon", help="Keep warm browsers running for scrape, login and replay to reuse"
+    )
+    daemon_parser.add_argument(
+        "--warm", type=int, default=1,
+        help="Browsers kept running even when idle [default: 1]"
+    )
+    daemon_parser.add_argument(
+        "--max", type=int, default=4,
+        help="Most browsers running at once [default: 4]"
+    )
+    daemon_parser.add_argument(
+        "--idle-minutes", type=float, default=10,
+        help="Close extra browsers idle for this long [default: 10]"
+    )
+    daemon_parser.add_argument(
+        "--headed", dest="headless", action="store_false", default=None,
+        help="Run visible browsers, serving only headed scrapes [default: config headless]"
+    )
+    daemon_parser.add_argument(
+        "--headless", dest="headless", action="store_true",
+        help="Run headless browsers, serving only headless scrapes"
+    )
+
+    # Command: queue
+    queue_parser = subparsers.add_parser(
+        "queue", help="Add scrape/download jobs to the shared job queue or show its status"
+    )
+    queue_parser.add_argument(
+        "--db",
+        default="jobs.db",
+        help="Job queue database, shared by every worker [default: jobs.db]"
+    )
+    queue_commands = queue_parser.add_subparsers(dest="queue_command")
+    queue_add = queue_commands.add_parser(
+        "add", parents=[scrape_options], help="Queue reels URLs to scrape or CSVs to download"
+    )
+    queue_add.add_argument(
+        "kind",
+        choices=["scrape", "download"],
+        help="Job kind: reels URLs to scrape or summary CSVs to download"
+    )
+    queue_add.add_argument(
+        "targets",
+        nargs="*",
+        help="Reels URLs (scrape) or CSV files (download)"
+    )
+    queue_add.add_argument(
+        "-f", "--file",
+        help="Text file with one target per line"
+    )
+    queue_add.add_argument(
+        "--attempts",
+        type=int,
+        default=3,
+        help="Attempts per job before it is marked failed [default: 3]"
+    )
+    queue_add.add_argument(
+        "-o", "--output",
+        default="downloads",
+        help="Base download folder for download jobs [default: downloads]"
+    )
+    queue_add.add_argument(
+        "-c", "--concurrency",
+        type=int,
+        default=1,
+        help="Reels downloaded at the same time within a download job [default: 1]"
+    )
+    queue_add.add_argument(
+        "--rendition",
+        default="best",
+        help="Video rendition for download jobs [default: best]"
+    )
+    queue_commands.add_parser("status", help="Show queue depth and worker throughput")
+    queue_commands.add_parser("retry", help="Queue every failed job again")
+
+    # Command: worker
+    worker_parser = subparsers.add_parser(
+        "worker", help="Run jobs from the shared job queue (start as many as you like)"
+    )
+    worker_parser.add_argument(
+        "--db",
+        default="jobs.db",
+        help="Job queue database, shared by every worker [default: jobs.db]"
+    )
+    worker_parser.add_argument(
+        "--kinds",
+        choices=["scrape", "download", "all"],
+        default="all",
+        help="Only take jobs of this kind [default: all]"
+    )
+    worker_parser.add_argument(
+        "--lease",
+        type=int,
+        default=120,
+        help="Seconds a job stays claimed without a heartbeat before another worker "
+             "may take it [default: 120]"
+    )
+    worker_parser.add_argument(
+        "--max-jobs",
+        type=int,
+        default=None,
+        help="Stop after this many jobs"
+    )
+    worker_parser.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="Stop once no job is queued or running instead of waiting for more"
+    )
     args = parser.parse_args()
 
     if args.command == "config":
@@ -126,47 +616,131 @@ def main():
     elif args.command == "login":
         config = load_config()
         username, password = load_credentials()
-        asyncio.run(login_instagram(username, password, headless=config.get("headless")))
+        asyncio.run(login_instagram(
+            username, password, headless=config.get("headless"), storage_file=args.save_as
+        ))
+
+    elif args.command == "sessions":
+        pool = SessionPool()
+        if not pool.files:
+            print("❌ No sessions yet. Run `python main.py login` first")
+            exit(1)
+        asyncio.run(pool.check())
+        for line in pool.describe():
+            print(line)
 
     elif args.command == "scrape":
         config = load_config()
-        if not Path("insta_session.json").exists():
+        pool = SessionPool()
+        session_file = asyncio.run(get_session(pool, headless=config.get("headless")))
+        if args.replay:
+            from replay import run_replay
+            asyncio.run(run_replay(
+                url=config["url"],
+                session_file=session_file,
+                output_dir=Path(config["output_dir"]),
+                headless=config["headless"],
+                max_pages=args.max_pages,
+                page_delay=config["scroll_delay"],
+                lean=args.lean,
+                layout=args.capture_format,
+                resume=args.resume,
+                incremental=args.incremental,
+                projection=args.projection,
+                raw_sample=args.raw_sample,
+            ))
+        else:
+            traffic = asyncio.run(run_scraper(
+                url=config["url"],
+                session_file=session_file,
+                output_dir=Path(config["output_dir"]),
+                scroll_count=config["scroll_count"],
+                scroll_delay=config["scroll_delay"],
+                headless=config["headless"],
+                adaptive=args.adaptive,
+                time_budget=args.time_budget,
+                lean=args.lean,
+                layout=args.capture_format,
+                resume=args.resume,
+                incremental=args.incremental,
+                projection=args.projection,
+                raw_sample=args.raw_sample,
+            ))
+            pool.quarantine_if_limited(session_file, traffic)
+
+    elif args.command == "batch":
+        from intrecept import run_batch
+        config = load_config()
+        urls = read_targets(args.urls, args.file)
+        if not urls:
+            print("❌ No URLs given. Pass them as arguments or with --file")
+            exit(1)
+        pool = SessionPool(strategy=args.rotate)
+        if not pool.files:
             username, password = load_credentials()
             asyncio.run(login_instagram(username, password, headless=config.get("headless")))
-        asyncio.run(run_scraper(
-            url=config["url"],
-            session_file=Path("insta_session.json"),
-            output_dir=Path(config["output_dir"]),
+        asyncio.run(run_batch(
+            urls,
+            session_file=None,
+            pool=pool,
+            output_dir=Path(config.get("output_dir") or "output"),
+            concurrency=args.concurrency,
+            retries=args.retries,
+            headless=config["headless"],
+            lean=args.lean,
+            layout=args.capture_format,
+            projection=args.projection,
+            raw_sample=args.raw_sample,
             scroll_count=config["scroll_count"],
             scroll_delay=config["scroll_delay"],
-            headless=config["headless"],
+            adaptive=args.adaptive,
+            time_budget=args.time_budget,
+            resume=args.resume,
+            incremental=args.incremental,
         ))
 
     elif args.command == "extract":
 
         config = load_config()
-        output_dir = Path(config.get("output_dir"))
-        output_csv = args.output 
-        rows = load_all_data(output_dir)
-        # write_csv(rows, output_csv)
-    
-        def sort_key(row):
-            keys = []
-            if args.sort_by_plays:
-                keys.append(float(row["plays"] or 0))  # .replace("M", "e6").replace("K", "e3")
-            if args.sort_by_likes:
-                keys.append(float(row["likes"] or 0))  # .replace("M", "e6").replace("K", "e3")
-            if args.sort_by_engagement:
-                keys.append(float(row["engagement_rate"].replace("%", "")))
-            return tuple(-k for k in keys) if keys else 0
-
-        if args.sort_by_plays or args.sort_by_likes or args.sort_by_engagement:
-            rows.sort(key=sort_key)
-
-        write_csv(rows, output_csv)
+        output_dir = Path(args.input or config.get("output_dir"))
+        output_csv = args.output
+        if args.format != "csv" and output_csv.endswith(".csv"):
+            output_csv = str(Path(output_csv).with_suffix("." + args.format))
+        workers = args.workers or os.cpu_count()
+        order_by = [
+            key for key, selected in (
+                ("plays", args.sort_by_plays),
+                ("likes", args.sort_by_likes),
+                ("engagement", args.sort_by_engagement),
+            ) if selected
+        ]
+        if args.stream:
+            from pipeline import stream_extract
+            stream_extract(
+                output_dir, output_csv, order_by, chunk_rows=args.chunk_rows, top=args.top,
+                fmt=args.format,
+            )
+            return
+
+        conn = store.connect(args.db or store.default_db_path(output_dir))
+        load_all_data(output_dir, full_rebuild=args.full_rebuild, workers=workers, store=conn)
+
+        if args.gained:
+            rows = store.top_gainers(conn, hours=args.gained, limit=args.top)
+            fields = CSV_FIELDS + ["plays_gained"]
+        else:
+            rows = store.query_reels(conn, order_by, limit=args.top)
+            fields = CSV_FIELDS
+        if args.format == "csv":
+            write_csv(rows, output_csv, sort=False, fields=fields)
+        else:
+            from columnar import export_columnar
+            export_columnar(rows, output_csv, args.format)
+        conn.close()
 
     elif args.command == "download":
         from downloader import download_reels_from_csv
+        from scheduler import Budget, format_progress
         csv_path = Path(args.input)
         output_base = Path(args.output)
         #  downloads/{csv filename}/
@@ -174,12 +748,148 @@ def main():
         print(f"csv_path : {csv_path}")
         print(f"output_base : {output_base}")
         print(f"output_dir : {output_dir}")
-        async def download():
-            await  download_reels_from_csv(
-            csv_path=csv_path,
-            output_folder=output_dir
+        if args.rendition not in ("best", "worst") and not args.rendition.isdigit():
+            print("❌ --rendition must be best, worst or a height such as 720")
+            exit(1)
+        captures = args.captures or load_config().get("output_dir")
+        budget = Budget(
+            max_bytes=args.max_mb * 1024 * 1024 if args.max_mb else None,
+            max_count=args.max_count,
+            max_seconds=args.max_minutes * 60 if args.max_minutes else None,
         )
+
+        def show_progress(event):
+            if event["status"] == "success":
+                print(format_progress(event))
+
+        async def download():
+            await download_reels_from_csv(
+                csv_path=csv_path,
+                output_folder=output_dir,
+                concurrency=args.concurrency,
+                rate=args.rate,
+                captures=Path(captures) if captures else None,
+                rendition=args.rendition,
+                retries=args.retries,
+                store_dir=output_base,
+                order_by=args.order_by,
+                budget=budget,
+                on_progress=show_progress,
+            )
         asyncio.run(download())
+    elif args.command == "gc":
+        import journal
+        from blobs import collect_garbage
+        output_base = Path(args.output)
+        removed = collect_garbage(output_base, dry_run=args.dry_run)
+        if removed and not args.dry_run:
+            conn = journal.connect(output_base / journal.JOURNAL_FILE)
+            journal.forget(conn, removed)
+            conn.close()
+    elif args.command == "queue":
+        import jobqueue
+        conn = jobqueue.connect(args.db)
+        if args.queue_command == "add":
+            targets = read_targets(args.targets, args.file)
+            if not targets:
+                print("❌ No targets given. Pass them as arguments or with --file")
+                exit(1)
+            if args.kind == "scrape":
+                options = {
+                    "adaptive": args.adaptive,
+                    "time_budget": args.time_budget,
+                    "lean": args.lean,
+                    "layout": args.capture_format,
+                    "projection": args.projection,
+                    "raw_sample": args.raw_sample,
+                    "resume": args.resume,
+                    "incremental": args.incremental,
+                }
+                from intrecept import name_targets, normalize_target
+                # Normalized as in batch, so one profile is queued once, and
+                # named along with every earlier scrape job so folders never clash
+                targets = list(dict.fromkeys(map(normalize_target, targets)))
+                names = name_targets(jobqueue.targets(conn, jobqueue.SCRAPE) + targets)
+                job_options = {target: dict(options, name=names[target]) for target in targets}
+            else:
+                # Resolved now so workers started elsewhere find the same files
+                targets = [str(Path(target).resolve()) for target in targets]
+                options = {
+                    "output": str(Path(args.output).resolve()),
+                    "concurrency": args.concurrency,
+                    "rendition": args.rendition,
+                }
+                job_options = dict.fromkeys(targets, options)
+            added = sum(
+                jobqueue.add(
+                    conn, args.kind, target, job_options[target], max_attempts=args.attempts,
+                )
+                for target in targets
+            )
+            print(f"📥 Queued {added} {args.kind} jobs ({len(targets) - added} already queued)")
+        elif args.queue_command == "retry":
+            print(f"🔁 Queued {jobqueue.retry_failed(conn)} failed jobs again")
+        else:
+            for line in jobqueue.format_status(jobqueue.status(conn)):
+                print(line)
+        conn.close()
+
+    elif args.command == "worker":
+        import jobqueue
+        config = load_config()
+        pool = SessionPool()
+        handlers = {
+            jobqueue.SCRAPE: lambda job, options: scrape_job(job, options, pool, config),
+            jobqueue.DOWNLOAD: lambda job, options: download_job(job, options, config),
+        }
+        if args.kinds != "all":
+            handlers = {args.kinds: handlers[args.kinds]}
+        asyncio.run(jobqueue.run_worker(
+            args.db,
+            handlers,
+            lease_seconds=args.lease,
+            max_jobs=args.max_jobs,
+            exit_when_empty=args.exit_when_empty,
+        ))
+
+    elif args.command == "watch":
+        from watch import Watcher
+        config = load_config()
+        urls = read_targets(args.urls, args.file)
+        if not urls:
+            print("❌ No URLs given. Pass them as arguments or with --file")
+            exit(1)
+        pool = SessionPool()
+        if not pool.files:
+            username, password = load_credentials()
+            asyncio.run(login_instagram(username, password, headless=config.get("headless")))
+        watcher = Watcher(
+            urls,
+            Path(config.get("output_dir") or "output"),
+            pool,
+            concurrency=args.concurrency,
+            per_hour=args.per_hour,
+            start_seconds=args.start_minutes * 60,
+            min_seconds=args.min_minutes * 60,
+            max_seconds=args.max_minutes * 60,
+            scroll_count=config["scroll_count"],
+            scroll_delay=config["scroll_delay"],
+            adaptive=args.adaptive,
+            lean=args.lean,
+            projection=args.projection,
+        )
+        asyncio.run(watcher.run(headless=config["headless"], passes=args.passes))
+
+    elif args.command == "daemon":
+        from daemon import run_daemon
+        # Scrapes, logins and the GUI launch with the config's setting, so match it
+        headless = bool(load_config().get("headless")) if args.headless is None else args.headless
+        asyncio.run(run_daemon(
+            warm=args.warm,
+            max_browsers=args.max,
+            headless=headless,
+            idle_seconds=args.idle_minutes * 60,
+        ))
     else:
         parser.print_help()
 
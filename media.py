@@ -0,0 +1,111 @@
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+
+import aiohttp
+
+from capture import iter_captures
+from reels import iter_media
+from utils import USER_AGENT, hash_file
+
+# Bytes read from the response per write
+CHUNK_BYTES = 1024 * 1024
+
+# CDN answers to a captured link that was rejected or has expired
+LINK_GONE = {403, 404, 410}
+
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Referer": "https://www.instagram.com/",
+}
+
+
+def index_video_versions(data_dir):
+    """
+    Maps each captured reel code to its `video_versions` list, keeping the
+    most recent capture since the CDN links expire. Captures are read from
+    `data_dir` and its subfolders one level down, where batch, watch and
+    queue workers keep each target's captures.
+    """
+    index = {}
+    captured = {}
+    if not data_dir or not Path(data_dir).is_dir():
+        return index
+    folders = [Path(data_dir)] + sorted(
+        path for path in Path(data_dir).iterdir()
+        if path.is_dir() and not path.name.startswith(".")
+    )
+    for folder in folders:
+        for record in iter_captures(folder):
+            ts = record.get("ts") or 0
+            for media in iter_media(record):
+                code = media.get("code")
+                versions = media.get("video_versions")
+                if code and versions and ts >= captured.get(code, 0):
+                    index[code] = versions
+                    captured[code] = ts
+    return index
+
+
+def pick_rendition(versions, policy="best"):
+    """
+    Picks a video URL from `video_versions`: "best" (largest, then highest
+    bandwidth), "worst", or a max height such as "720" (the best one not
+    taller than that, else the smallest).
+    """
+    versions = [v for v in versions if v.get("url")]
+    if not versions:
+        return None
+    ranked = sorted(
+        versions,
+        key=lambda v: (v.get("height") or 0, v.get("width") or 0, v.get("bandwidth") or 0),
+    )
+    if policy == "worst":
+        return ranked[0]["url"]
+    if policy == "best":
+        return ranked[-1]["url"]
+    max_height = int(policy)
+    fitting = [v for v in ranked if (v.get("height") or 0) <= max_height]
+    return (fitting[-1] if fitting else ranked[0])["url"]
+
+
+def open_session(concurrency=1):
+    """Keep-alive HTTP client shared by all download workers."""
+    connector = aiohttp.TCPConnector(limit=max(1, int(concurrency)), keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=15, sock_read=60)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS)
+
+
+async def fetch_video(session, url, output_file):
+    """
+    Streams `url` into `output_file` through a `.part` file, renamed only
+    once complete. A `.part` left by an interrupted run is continued with a
+    Range request when the server supports it.
+
+    Returns (bytes, sha256) of the finished file.
+    """
+    output_file = Path(output_file)
+    part_file = output_file.with_name(output_file.name + ".part")
+    offset = part_file.stat().st_size if part_file.exists() else 0
+    headers = {"Range": f"bytes={offset}-"} if offset else None
+    digest = hashlib.sha256()
+    async with session.get(url, headers=headers) as response:
+        if response.status == 416:
+            # The partial file does not match this video, start over
+            part_file.unlink()
+            return await fetch_video(session, url, output_file)
+        response.raise_for_status()
+        if offset and response.status == 206:
+            await asyncio.to_thread(hash_file, part_file, digest)
+            mode = "ab"
+        else:
+            offset, mode = 0, "wb"
+        size = offset
+        with open(part_file, mode) as f:
+            async for chunk in response.content.iter_chunked(CHUNK_BYTES):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+    os.replace(part_file, output_file)
+    return size, digest.hexdigest()
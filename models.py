@@ -0,0 +1,87 @@
+def format_number(count):
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.1f}M"
+    elif count >= 1_000:
+        return f"{count / 1_000:.0f}K"
+    return str(count)
+
+
+def parse_number(text):
+    """Inverse of `format_number` for CSV values: "17.1M" -> 17100000, "3.46%" -> 3.46."""
+    text = str(text or "").strip().replace(",", "").rstrip("%")
+    scale = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}.get(text[-1:].upper())
+    try:
+        return float(text[:-1]) * scale if scale else float(text or 0)
+    except ValueError:
+        return 0.0
+
+
+class ReelRecord:
+    """
+    One captured reel with raw integer counts. Formatting ("17.1M", "3.46%")
+    only happens at the output boundary, see `format_row`.
+    """
+
+    __slots__ = ("code", "pk", "plays", "likes", "captured_at")
+
+    def __init__(self, code, plays=0, likes=0, captured_at=0.0, pk=None):
+        self.code = code
+        self.pk = pk
+        self.plays = plays
+        self.likes = likes
+        self.captured_at = captured_at
+
+    @property
+    def key(self):
+        """Dedup key: the media code, or the pk for media without one."""
+        return self.code or (str(self.pk) if self.pk else "")
+
+    @property
+    def url(self):
+        return f"instagram.com/reel/{self.code}/" if self.code else ""
+
+    @property
+    def engagement(self):
+        return round(self.likes / self.plays * 100, 2) if self.plays else 0.0
+
+    def to_list(self):
+        return [self.code, self.plays, self.likes, self.captured_at, self.pk]
+
+    @classmethod
+    def from_list(cls, values):
+        return cls(*values[:4], pk=values[4])
+
+    def __reduce__(self):
+        # Compact pickling for process pools and sort spill files
+        return ReelRecord.from_list, (self.to_list(),)
+
+    def __repr__(self):
+        return (f"ReelRecord({self.key!r}, plays={self.plays}, likes={self.likes}, "
+                f"captured_at={self.captured_at})")
+
+
+class GainRecord(ReelRecord):
+    """A reel together with the plays it gained over some time window."""
+
+    __slots__ = ("plays_gained",)
+
+    def __init__(self, code, plays=0, likes=0, captured_at=0.0, pk=None, plays_gained=0):
+        super().__init__(code, plays, likes, captured_at, pk)
+        self.plays_gained = plays_gained
+
+    def __reduce__(self):
+        return GainRecord, (self.code, self.plays, self.likes, self.captured_at, self.pk,
+                            self.plays_gained)
+
+
+def format_row(record):
+    """Output form of a record, as written to the CSV and shown in the GUI."""
+    row = {
+        "url": record.url,
+        "plays": format_number(record.plays),
+        "likes": format_number(record.likes),
+        "engagement_rate": f"{record.engagement:.2f}%",
+    }
+    if getattr(record, "plays_gained", None) is not None:
+        row["plays_gained"] = record.plays_gained
+    return row
@@ -0,0 +1,158 @@
+import csv
+import heapq
+import pickle
+import tempfile
+import time
+from itertools import groupby, islice
+from pathlib import Path
+
+from capture import capture_files, iter_file_records
+from columnar import export_columnar
+from reels import CSV_FIELDS, extract_from_record, format_row
+from utils import log
+
+# Rows held in memory before a sorted run is spilled to disk
+CHUNK_ROWS = 200_000
+# Rows pickled together in a spill file
+SPILL_BATCH = 1_000
+
+SORT_KEYS = {
+    "plays": lambda row: row.plays,
+    "likes": lambda row: row.likes,
+    "engagement": lambda row: row.engagement,
+}
+
+
+def iter_rows(data_dir):
+    """Streams one ReelRecord per extracted row, capture by capture."""
+    for path in capture_files(data_dir):
+        for record in iter_file_records(path):
+            yield from extract_from_record(record)
+
+
+def external_sort(rows, key, chunk_rows=CHUNK_ROWS, tmp_dir=None):
+    """
+    Sorts any number of rows with at most `chunk_rows` in memory: each
+    sorted chunk is spilled to a temp file, then the files are merged.
+    """
+    with tempfile.TemporaryDirectory(dir=tmp_dir, prefix="reels-sort-") as spill_dir:
+        runs = []
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            chunk.sort(key=key)
+            if not runs and len(chunk) < chunk_rows:
+                # Everything fit in one chunk, no need to touch the disk
+                yield from chunk
+                return
+            runs.append(spill(chunk, Path(spill_dir) / f"run_{len(runs):05d}.pkl"))
+            del chunk
+        yield from heapq.merge(*(read_spill(path) for path in runs), key=key)
+
+
+def spill(rows, path):
+    with open(path, "wb") as f:
+        for start in range(0, len(rows), SPILL_BATCH):
+            pickle.dump(rows[start:start + SPILL_BATCH], f, pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def read_spill(path):
+    with open(path, "rb") as f:
+        while True:
+            try:
+                yield from pickle.load(f)
+            except EOFError:
+                return
+
+
+def dedupe_sorted(rows, chunk_rows=CHUNK_ROWS, tmp_dir=None):
+    """
+    Keeps the latest capture of each reel by sorting on (code, capture time)
+    out of core and taking the last row of every code group.
+    """
+    ordered = external_sort(
+        rows, key=lambda row: (row.key, row.captured_at),
+        chunk_rows=chunk_rows, tmp_dir=tmp_dir,
+    )
+    for code, group in groupby(ordered, key=lambda row: row.key):
+        if not code:
+            yield from group
+            continue
+        for latest in group:
+            pass
+        yield latest
+
+
+def sort_key(order_by):
+    keys = [SORT_KEYS[name] for name in order_by] or [SORT_KEYS["plays"]]
+    return lambda row: tuple(-key(row) for key in keys)
+
+
+def top_n(rows, n, order_by=("plays",)):
+    """
+    The first `n` rows in `order_by` order, picked with a bounded heap as
+    rows stream in: O(n) memory and no full sort.
+    """
+    return heapq.nsmallest(n, rows, key=sort_key(order_by))
+
+
+def extract_top(data_dir, n, order_by=("plays",), chunk_rows=CHUNK_ROWS, tmp_dir=None):
+    """
+    The best `n` deduplicated reels in `data_dir`, streamed from the
+    captures: only the dedup sort runs and the heap ever hold rows.
+    """
+    return top_n(dedupe_sorted(iter_rows(data_dir), chunk_rows, tmp_dir), n, order_by)
+
+
+def write_csv_stream(rows, output_file):
+    count = 0
+    with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(format_row(row))
+            count += 1
+    return count
+
+
+def peak_memory_mb():
+    """Peak resident memory of this process, or None where it cannot be read (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stream_extract(data_dir, output_file, order_by=("plays",), chunk_rows=CHUNK_ROWS,
+                   tmp_dir=None, top=None, fmt="csv"):
+    """
+    Captures -> deduplicated, sorted CSV without ever holding the whole
+    dataset: rows stream from the captures through two external sorts
+    (dedup, then the requested order) straight into the CSV writer.
+
+    With `top`, the second sort is replaced by a heap keeping only the
+    best `top` rows. `fmt` "parquet" or "arrow" writes a columnar file
+    instead of the CSV (written in one go, with percentiles, for `top`).
+    """
+    started = time.perf_counter()
+    if top:
+        rows = extract_top(data_dir, top, order_by, chunk_rows, tmp_dir)
+    else:
+        rows = dedupe_sorted(iter_rows(data_dir), chunk_rows, tmp_dir)
+        rows = external_sort(rows, sort_key(order_by), chunk_rows, tmp_dir)
+    if fmt == "csv":
+        count = write_csv_stream(rows, output_file)
+        log(f"[✓] Wrote {count} rows to {output_file}")
+    else:
+        # Top N rows fit in memory, so they keep the percentile columns
+        count = export_columnar(rows, output_file, fmt, streaming=not top)
+    log(f"⏱️ Finished in {time.perf_counter() - started:.2f}s")
+    peak = peak_memory_mb()
+    if peak is not None:
+        log(f"📈 Peak memory: {peak:.1f} MB")
+    return count
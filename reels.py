@@ -1,79 +1,257 @@
-import json
 import csv
-from utils import log
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from capture import (
+    CLIPS_CONNECTION, capture_files, iter_file_records, loads, read_capture_file,
+)
+from models import ReelRecord, format_row
+from store import ingest as store_ingest, is_empty as store_is_empty
+from utils import hash_file, load_json, log, write_json
 
+# Manifest of processed captures, kept in the data folder
+EXTRACT_CACHE = ".extract_cache.json"
+# Their extracted rows, one `[capture name, rows]` line per capture in manifest order
+EXTRACT_ROWS = ".extract_rows.ndjson"
+EXTRACT_CACHE_VERSION = 5
 
-def format_number(count):
-    if count >= 1_000_000:
-        return f"{count / 1_000_000:.1f}M"
-    elif count >= 1_000:
-        return f"{count / 1_000:.0f}K"
-    return str(count)
+CSV_FIELDS = ["url", "plays", "likes", "engagement_rate"]
 
 
 def extract_media_info(json_path):
-    with open(json_path, encoding="utf-8") as f:
-        try:
-            content = json.load(f)
-        except Exception as e:
-            log(f"Error parsing {json_path}: {e}")
-            return []
-
-    results = []
-    # GraphQL files
-    if json_path.name.startswith("query_"):
-        edges = content.get("data", {}) \
-                       .get("xdt_api__v1__clips__user__connection_v2", {}) \
-                       .get("edges", [])
+    record = read_capture_file(json_path)
+    return extract_from_record(record) if record else []
+
+
+def extract_from_record(record):
+    captured_at = record.get("ts") or 0
+    return [parse_media_item(media, captured_at) for media in iter_media(record)]
+
+
+def iter_media(record):
+    """Yields the raw media nodes of a captured record."""
+    content = record.get("data") or {}
+    # GraphQL captures
+    if record.get("endpoint") == "graphql":
+        edges = get_clips_connection(content).get("edges", [])
         for edge in edges:
-            media = edge.get("node", {}).get("media", {})
-            results.append(parse_media_item(media))
+            yield edge.get("node", {}).get("media", {})
 
-    # RestAPI files
-    elif json_path.name.startswith("rest_"):
+    # RestAPI captures
+    elif record.get("endpoint") == "rest":
         items = content.get("items", [])
         for item in items:
-            media = item.get("media", item) 
-            results.append(parse_media_item(media))
-    return results
-
-
-def parse_media_item(media):
-    reel_link = f"instagram.com/reel/{media.get('code')}/" if media.get("code") else ""
-    plays = media.get("play_count", 0)
-    likes = media.get("like_count", 0)
-    engagement = round((likes / plays * 100), 2) if plays else 0.0
-    return {
-        "url": reel_link,
-        "plays": plays,
-        "likes": likes,
-        "engagement_rate": f"{engagement:.2f}%",
-    }
-
-
-def load_all_data(data_dir):
-    all_rows = []
-    for json_file in data_dir.glob("*.json"):
-        all_rows.extend(extract_media_info(json_file))
+            yield item.get("media", item)
+
+
+def get_clips_connection(content):
+    return (content.get("data") or {}).get(CLIPS_CONNECTION) or {}
+
+
+def parse_media_item(media, captured_at=0):
+    code = media.get("code") or ""
+    return ReelRecord(
+        code,
+        plays=int(media.get("play_count") or 0),
+        likes=int(media.get("like_count") or 0),
+        captured_at=captured_at,
+        pk=None if code else media.get("pk"),
+    )
+
+
+def dedupe_rows(rows):
+    """
+    Collapses rows of the same reel (by media code, or pk when there is no
+    code), keeping the most recently captured metrics.
+
+    Only one row per distinct reel is held, so memory follows the number of
+    reels rather than the number of captured rows. Returns (rows, collapsed).
+    """
+    latest = {}
+    unkeyed = []
+    seen = 0
+    for row in rows:
+        seen += 1
+        key = row.key
+        if not key:
+            unkeyed.append(row)
+            continue
+        current = latest.get(key)
+        if current is None or row.captured_at >= current.captured_at:
+            latest[key] = row
+    unique = list(latest.values()) + unkeyed
+    return unique, seen - len(unique)
+
+
+def load_all_data(data_dir, full_rebuild=False, workers=1, store=None):
+    """
+    Extracts rows from every capture in `data_dir`.
+
+    Files whose size and mtime (or, failing that, content hash) match the
+    manifest reuse their cached rows; only new or changed captures are
+    parsed. `full_rebuild` ignores the cache and re-parses everything.
+
+    With `workers` > 1 the captures to parse are spread over a process
+    pool. Rows come back in file order, so the result is the same as the
+    serial path.
+
+    When a `store` connection is given, rows from newly parsed captures are
+    added to it as snapshots (every cached row too if the store is empty).
+
+    Captures, parsed or cached, are read one at a time and folded into one
+    map of the latest row per reel, and cached rows are streamed from and
+    back to disk, so memory follows the number of distinct reels rather
+    than the number of captured rows.
+    """
+    started = time.perf_counter()
+    data_dir = Path(data_dir)
+    known = {} if full_rebuild else load_extract_cache(data_dir).get("manifest", {})
+    order = {name: i for i, name in enumerate(known)}
+    manifest = {}
+    stats = Counter()
+    ingest_cached = store is not None and store_is_empty(store)
+
+    # Cached rows are stored in manifest order and read forward only, so a
+    # capture can only use them while it keeps that order
+    plan = []
+    to_scan = []
+    last = -1
+    for path in capture_files(data_dir):
+        entry = known.get(path.name)
+        if entry is None or order[path.name] < last:
+            plan.append((path, False))
+            to_scan.append((path, None))
+            continue
+        last = order[path.name]
+        stat = path.stat()
+        unchanged = entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns
+        plan.append((path, unchanged))
+        if not unchanged:
+            to_scan.append((path, entry["sha256"]))
+
+    cached_rows = read_cached_rows(data_dir)
+    rows_file = data_dir / EXTRACT_ROWS
+    tmp_file = rows_file.with_name(rows_file.name + ".tmp")
+
+    def take_cached(name):
+        for cached_name, values in cached_rows:
+            if cached_name == name:
+                return [ReelRecord.from_list(row) for row in values]
+        return None
+
+    def capture_rows(out):
+        scanned = scan_captures(to_scan, workers)
+        for path, unchanged in plan:
+            entry = known.get(path.name)
+            rows = None
+            if unchanged:
+                rows = take_cached(path.name)
+            else:
+                digest, parsed = next(scanned)
+                stat = path.stat()
+                if parsed is None:
+                    entry = dict(entry, size=stat.st_size, mtime=stat.st_mtime_ns, sha256=digest)
+                    rows = take_cached(path.name)
+            if rows is not None:
+                stats["cached"] += 1
+                stats["collapsed"] += entry.get("collapsed", 0)
+                if ingest_cached:
+                    stats["stored"] += store_ingest(store, rows, say=None)
+            else:
+                if unchanged or parsed is None:
+                    # The cached rows went missing, parse the capture again
+                    digest, parsed = scan_capture(path)
+                    stat = path.stat()
+                stats["parsed"] += 1
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest}
+                # Every snapshot goes to the store, only the latest per reel is kept here
+                if store is not None:
+                    stats["stored"] += store_ingest(store, parsed, say=None)
+                rows, entry["collapsed"] = dedupe_rows(parsed)
+                stats["collapsed"] += entry["collapsed"]
+            manifest[path.name] = entry
+            out.write(json.dumps([path.name, [row.to_list() for row in rows]]) + "\n")
+            yield from rows
+
+    with open(tmp_file, "w", encoding="utf-8") as out:
+        all_rows, collapsed = dedupe_rows(capture_rows(out))
+    cached_rows.close()
+    collapsed += stats["collapsed"]
+    if store is not None:
+        log(f"🗃️ Stored {stats['stored']} snapshots")
+
+    # Rows first: a manifest never points at rows that were not written
+    os.replace(tmp_file, rows_file)
+    save_extract_cache(data_dir, {"version": EXTRACT_CACHE_VERSION, "manifest": manifest})
+    log(f"🗂️ Captures: {stats['parsed']} parsed, {stats['cached']} unchanged")
+    log(f"🧬 Collapsed {collapsed} duplicate rows into {len(all_rows)} reels")
+    log(
+        f"⏱️ Extracted {len(all_rows)} rows in {time.perf_counter() - started:.2f}s "
+        f"({max(1, workers)} worker{'s' if workers > 1 else ''})"
+    )
     return all_rows
 
 
-def write_csv(rows, output_file):
-    # Sort by plays descending
+def scan_captures(paths, workers=1):
+    """
+    Yields (sha256, rows) for each (path, known sha256) pair; rows is None
+    when the content still matches the known hash.
+    """
+    if workers <= 1 or len(paths) < 2:
+        for path, known in paths:
+            yield scan_capture(path, known)
+        return
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(scan_capture, *zip(*paths), chunksize=chunksize)
+
+
+def scan_capture(path, known_digest=None):
+    digest = hash_file(path).hexdigest()
+    if digest == known_digest:
+        return digest, None
+    rows = []
+    for record in iter_file_records(path):
+        rows.extend(extract_from_record(record))
+    return digest, rows
+
+
+def read_cached_rows(data_dir):
+    """Streams (capture name, row lists) from the cached rows file, stopping at a damaged line."""
+    try:
+        with open(Path(data_dir) / EXTRACT_ROWS, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    name, rows = loads(line)
+                except ValueError:
+                    return
+                yield name, rows
+    except OSError:
+        return
+
+
+def load_extract_cache(data_dir):
+    cache = load_json(Path(data_dir) / EXTRACT_CACHE)
+    return cache if cache.get("version") == EXTRACT_CACHE_VERSION else {}
+
+
+def save_extract_cache(data_dir, cache):
+    write_json(Path(data_dir) / EXTRACT_CACHE, cache, separators=(",", ":"))
+
 
-    rows.sort(key=lambda r: r.get("plays") or 0, reverse=True)
+def write_csv(rows, output_file, sort=True, fields=CSV_FIELDS):
+    # Sort by plays descending, unless rows come already ordered
+    if sort:
+        rows.sort(key=lambda r: r.plays, reverse=True)
     if not rows:
         log("No data to write.")
         return
-    formatted_rows = [
-        {
-            **item,
-            "plays": format_number(item.get("plays") or 0),
-            "likes": format_number(item.get("likes") or 0)
-        } for item in rows
-    ]
+    formatted_rows = (format_row(record) for record in rows)
     with open(output_file, "w", newline="", encoding="utf-8") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=rows[0].keys())
+        writer = csv.DictWriter(csvfile, fieldnames=fields, extrasaction="ignore")
         writer.writeheader()
         writer.writerows(formatted_rows)
 
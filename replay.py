@@ -0,0 +1,233 @@
+import asyncio
+import json
+import random
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import aiohttp
+from playwright.async_api import async_playwright
+
+from capture import CaptureWriter
+from checkpoint import Checkpoint
+from daemon import lease_browser
+from intrecept import block_heavy, is_last_page, log_blocked, request_template
+from reels import CLIPS_CONNECTION, get_clips_connection
+from sessions import load_session_cookies
+from utils import log
+
+TEMPLATE_FILE = ".replay_template.json"
+
+
+async def capture_replay_template(
+    url, session_file, output_dir=Path("output"), headless=False, max_scrolls=10,
+    lean=False, layout="log", checkpoint=None, projection="full", raw_sample=0.0
+):
+    """
+    Opens the reels page in a browser until the first reels GraphQL request
+    goes out, and saves it (url, headers, doc_id, variables, cursor) as a
+    template that `replay_pages` can page through without a browser.
+    The request and its page are also recorded in `checkpoint` if given.
+    """
+    found = asyncio.get_running_loop().create_future()
+
+    async def on_response(response):
+        if found.done() or "graphql" not in response.url or response.status != 200:
+            return
+        try:
+            body = await response.body()
+            data = json.loads(body)
+            if CLIPS_CONNECTION not in (data.get("data") or {}):
+                return
+            template = await request_template(response.request)
+            if not found.done():
+                found.set_result((template, data, len(body)))
+        except Exception as e:
+            log(f"⚠️ Could not read GraphQL response: {e}")
+
+    async with async_playwright() as p, lease_browser(
+        p, lambda: p.chromium.launch(headless=headless), headless
+    ) as browser:
+        context = await browser.new_context(storage_state=str(session_file))
+        blocked = Counter()
+        if lean:
+            await context.route("**/*", lambda route: block_heavy(route, blocked))
+        page = await context.new_page()
+        page.on("response", on_response)  # type: ignore
+
+        log(f"🔗 Navigating to: {url}")
+        await page.goto(url, wait_until="domcontentloaded")
+
+        # The first page is often rendered with the HTML, so scroll until
+        # the browser has to ask GraphQL for the next one
+        for _ in range(max_scrolls):
+            try:
+                await asyncio.wait_for(asyncio.shield(found), 3)
+                break
+            except asyncio.TimeoutError:
+                await page.evaluate("window.scrollBy(0, document.body.scrollHeight)")
+
+        await context.close()
+    log_blocked(blocked)
+
+    if not found.done():
+        log("❌ No reels GraphQL request seen, cannot build a replay template.")
+        return None
+
+    template, data, size = found.result()
+    async with CaptureWriter(
+        output_dir, layout=layout, projection=projection, raw_sample=raw_sample
+    ) as writer:
+        await writer.put(data, template["url"], size)
+    connection = get_clips_connection(data)
+    if checkpoint is not None:
+        checkpoint.template = dict(template)
+        checkpoint.observe(connection)
+        checkpoint.save()
+    template["end_cursor"] = (connection.get("page_info") or {}).get("end_cursor")
+    template["has_next_page"] = not is_last_page(connection)
+    template_file = Path(output_dir) / TEMPLATE_FILE
+    template_file.write_text(json.dumps(template, indent=2), encoding="utf-8")
+    log(f"🧩 Replay template saved to {template_file}")
+    return template
+
+
+def build_request(template, cursor):
+    """Returns (url, form fields) for the page after `cursor`."""
+    url = template["url"]
+    if template.get("method", "POST").upper() == "GET":
+        parsed = urlparse(url)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        query["variables"] = with_cursor(query.get("variables"), cursor)
+        return parsed._replace(query=urlencode(query)).geturl(), None
+
+    form = {k: v[0] for k, v in parse_qs(template.get("post_data") or "").items()}
+    form["variables"] = with_cursor(form.get("variables"), cursor)
+    return url, form
+
+
+def with_cursor(variables, cursor):
+    variables = json.loads(variables) if variables else {}
+    variables["after"] = cursor
+    return json.dumps(variables, separators=(",", ":"))
+
+
+async def replay_pages(
+    template,
+    session_file=None,
+    output_dir=Path("output"),
+    max_pages=100,
+    page_delay=1.0,
+    retries=3,
+    layout="log",
+    projection="full",
+    raw_sample=0.0,
+    cursor=None,
+    checkpoint=None,
+    incremental=False,
+):
+    """
+    Pages through the reels connection over plain HTTP, starting after
+    `cursor` (the template's cursor by default), and saves every page like
+    a browser capture.
+
+    Each page is recorded in `checkpoint` if given; with `incremental`,
+    paging stops at the first page holding reels seen in an earlier run.
+
+    Returns the number of pages saved.
+    """
+    if cursor is None:
+        if not template.get("has_next_page", True):
+            log("🏁 Template is already on the last page.")
+            return 0
+        cursor = template.get("end_cursor")
+    if not cursor:
+        log("🏁 No cursor to continue from.")
+        return 0
+
+    headers = template.get("headers", {})
+    cookies = load_session_cookies(session_file, template["url"])
+    method = template.get("method", "POST").upper()
+    saved = 0
+
+    connector = aiohttp.TCPConnector(limit_per_host=4, keepalive_timeout=60)
+    async with CaptureWriter(
+        output_dir, layout=layout, projection=projection, raw_sample=raw_sample
+    ) as writer, aiohttp.ClientSession(
+        connector=connector, headers=headers, cookies=cookies
+    ) as session:
+        while saved < max_pages:
+            url, form = build_request(template, cursor)
+            data = None
+            for attempt in range(1, retries + 1):
+                try:
+                    async with session.request(method, url, data=form) as response:
+                        if response.status == 200:
+                            body = await response.read()
+                            data = json.loads(body)
+                            break
+                        log(f"⚠️ Page request returned {response.status} (try {attempt})")
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    log(f"⚠️ Page request failed (try {attempt}): {e}")
+                if attempt < retries:
+                    await asyncio.sleep(2 ** attempt + random.uniform(0, 1))
+
+            if data is None:
+                log("❌ Giving up on replay after repeated failures.")
+                break
+
+            connection = get_clips_connection(data)
+            if not connection:
+                log("❌ Response has no reels connection, session may be expired.")
+                break
+
+            await writer.put(data, url, len(body))
+            saved += 1
+            log(f"📄 Replayed page {saved} ({len(connection.get('edges', []))} reels)")
+            if checkpoint is not None:
+                checkpoint.count_scroll()
+                known = checkpoint.observe(connection)
+                await checkpoint.autosave()
+                if incremental and known:
+                    log("🔁 Reached reels from a previous run, stopping.")
+                    break
+
+            cursor = (connection.get("page_info") or {}).get("end_cursor")
+            if is_last_page(connection) or not cursor:
+                log("🏁 Reached the end of the feed.")
+                break
+            await asyncio.sleep(page_delay)
+
+    if checkpoint is not None:
+        checkpoint.save()
+    log(f"💾 Total pages replayed: {saved}")
+    writer.report()
+    return saved
+
+
+async def run_replay(
+    url, session_file, output_dir=Path("output"), headless=False,
+    max_pages=100, page_delay=1.0, lean=False, layout="log", resume=False,
+    incremental=False, projection="full", raw_sample=0.0,
+):
+    checkpoint = Checkpoint(output_dir)
+    if resume and checkpoint.can_resume:
+        log(f"⏩ Resuming after {checkpoint.scrolls} pages from the saved cursor")
+        await replay_pages(
+            checkpoint.template, session_file, output_dir, max_pages, page_delay,
+            layout=layout, cursor=checkpoint.end_cursor, checkpoint=checkpoint,
+            incremental=incremental, projection=projection, raw_sample=raw_sample,
+        )
+    else:
+        checkpoint.start_from_top(incremental)
+        template = await capture_replay_template(
+            url, session_file, output_dir, headless, lean=lean, layout=layout,
+            checkpoint=checkpoint, projection=projection, raw_sample=raw_sample,
+        )
+        if template:
+            await replay_pages(
+                template, session_file, output_dir, max_pages, page_delay,
+                layout=layout, checkpoint=checkpoint, incremental=incremental,
+                projection=projection, raw_sample=raw_sample,
+            )
+    checkpoint.report()
@@ -0,0 +1,92 @@
+import time
+
+from models import parse_number
+from utils import format_bytes
+
+# CSV column each priority reads
+PRIORITY_COLUMNS = {"plays": "plays", "likes": "likes", "engagement": "engagement_rate"}
+
+
+def prioritize(rows, order_by=None):
+    """CSV rows by `order_by` (plays, likes or engagement), highest first; CSV order if unset."""
+    if not order_by:
+        return list(rows)
+    column = PRIORITY_COLUMNS[order_by]
+    return sorted(rows, key=lambda row: parse_number(row.get(column)), reverse=True)
+
+
+class Budget:
+    """
+    Limits on new downloads in one run: total bytes, number of videos and
+    wall time. Reels served from the store cost nothing.
+    """
+
+    def __init__(self, max_bytes=None, max_count=None, max_seconds=None):
+        self.max_bytes = max_bytes
+        self.max_count = max_count
+        self.max_seconds = max_seconds
+        self.started = time.monotonic()
+        self.bytes = 0
+        self.count = 0
+        self.pending = 0
+
+    def reserve(self):
+        """Counts a download as started against the count budget."""
+        self.pending += 1
+
+    def release(self):
+        self.pending -= 1
+
+    def spend(self, size):
+        self.pending -= 1
+        self.bytes += size
+        self.count += 1
+
+    def exhausted(self):
+        """Why the budget is used up, or None while there is room left."""
+        if self.max_bytes and self.bytes >= self.max_bytes:
+            return f"byte budget of {format_bytes(self.max_bytes)} reached"
+        if self.max_count and self.count + self.pending >= self.max_count:
+            return f"download budget of {self.max_count} reels reached"
+        if self.max_seconds and time.monotonic() - self.started >= self.max_seconds:
+            return f"time budget of {self.max_seconds:.0f}s reached"
+        return None
+
+
+class Progress:
+    """Counts finished rows and downloaded bytes, and builds progress events."""
+
+    def __init__(self, total, budget=None):
+        self.total = total
+        self.budget = budget
+        self.done = 0
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def event(self, reel_id, status, size=0):
+        self.done += 1
+        self.bytes += size
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        throughput = self.bytes / elapsed
+        eta = (self.total - self.done) * elapsed / self.done
+        if self.budget and self.budget.max_bytes and throughput:
+            eta = min(eta, max(0, self.budget.max_bytes - self.budget.bytes) / throughput)
+        if self.budget and self.budget.max_seconds:
+            eta = min(eta, max(0, self.budget.max_seconds - elapsed))
+        return {
+            "reel_id": reel_id,
+            "status": status,
+            "done": self.done,
+            "total": self.total,
+            "fraction": self.done / self.total if self.total else 1.0,
+            "bytes": self.bytes,
+            "throughput": throughput,
+            "eta": eta,
+        }
+
+
+def format_progress(event):
+    return (
+        f"📶 {event['done']}/{event['total']} · {format_bytes(event['bytes'])} · "
+        f"{format_bytes(int(event['throughput']))}/s · ETA {event['eta']:.0f}s"
+    )
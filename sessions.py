@@ -0,0 +1,199 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import aiohttp
+
+from utils import USER_AGENT, load_json, log, write_json
+
+SESSIONS_DIR = "sessions"
+DEFAULT_SESSION = "insta_session.json"
+POOL_STATE = ".pool_state.json"
+
+# Returns the logged-in user without loading any feed
+PROBE_URL = "https://www.instagram.com/api/v1/accounts/current_user/?edit=true"
+PROBE_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "X-IG-App-ID": "936619743392459",
+    "X-Requested-With": "XMLHttpRequest",
+}
+
+# Probe outcomes
+VALID, EXPIRED, RATE_LIMITED, UNKNOWN = "valid", "expired", "rate_limited", "unknown"
+
+
+def load_session_cookies(session_file, request_url):
+    """Cookies from a Playwright storage state that apply to `request_url`."""
+    if not session_file or not Path(session_file).exists():
+        return {}
+    host = urlparse(request_url).hostname or ""
+    state = json.loads(Path(session_file).read_text(encoding="utf-8"))
+    return {
+        cookie["name"]: cookie["value"]
+        for cookie in state.get("cookies", [])
+        if host == cookie["domain"].lstrip(".") or host.endswith(cookie["domain"])
+    }
+
+
+def session_expired(session_file):
+    """True when the storage state has no `sessionid` cookie or it has expired."""
+    try:
+        state = json.loads(Path(session_file).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return True
+    for cookie in state.get("cookies", []):
+        if cookie.get("name") == "sessionid":
+            expires = cookie.get("expires", -1)
+            return 0 < expires < time.time()
+    return True
+
+
+async def probe_session(http, session_file, url=PROBE_URL):
+    """
+    Checks a session with one small authenticated API call. Returns VALID,
+    EXPIRED, RATE_LIMITED or UNKNOWN (network trouble, try again later).
+    """
+    if session_expired(session_file):
+        return EXPIRED
+    cookies = load_session_cookies(session_file, url)
+    headers = dict(PROBE_HEADERS)
+    if cookies.get("csrftoken"):
+        headers["X-CSRFToken"] = cookies["csrftoken"]
+    cookie_header = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    try:
+        async with http.get(
+            url, headers={**headers, "Cookie": cookie_header}, allow_redirects=False
+        ) as response:
+            if response.status == 429:
+                return RATE_LIMITED
+            if response.status != 200:
+                # Logged-out requests get 401/403 or a redirect to the login page
+                return EXPIRED if response.status in (301, 302, 401, 403) else UNKNOWN
+            data = await response.json(content_type=None)
+            return VALID if data.get("user") else EXPIRED
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return UNKNOWN
+
+
+class SessionPool:
+    """
+    Several Playwright storage states (`sessions/*.json` plus
+    `insta_session.json`) handed out to scrape targets.
+
+    `acquire` picks the least recently used usable session ("lru") or goes
+    round-robin ("round-robin"). Sessions that get rate-limited are
+    quarantined for `quarantine_seconds`, and expired ones are left out
+    until they are replaced. Pool state is kept in `sessions/.pool_state.json`
+    so quarantines survive between runs.
+    """
+
+    def __init__(self, sessions_dir=SESSIONS_DIR, default_file=DEFAULT_SESSION,
+                 strategy="lru", quarantine_seconds=900, probe_url=PROBE_URL):
+        self.sessions_dir = Path(sessions_dir)
+        self.default_file = Path(default_file)
+        self.strategy = strategy
+        self.quarantine_seconds = quarantine_seconds
+        self.probe_url = probe_url
+        self.state_file = self.sessions_dir / POOL_STATE
+        self.state = self.load_state()
+        self.turn = 0
+
+    def load_state(self):
+        return load_json(self.state_file)
+
+    def save_state(self):
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        write_json(self.state_file, self.state, indent=2)
+
+    @property
+    def files(self):
+        files = sorted(
+            path for path in self.sessions_dir.glob("*.json") if not path.name.startswith(".")
+        )
+        if self.default_file.exists():
+            files.insert(0, self.default_file)
+        return files
+
+    def entry(self, path):
+        return self.state.setdefault(str(path), {})
+
+    def usable(self, path):
+        entry = self.entry(path)
+        if entry.get("quarantined_until", 0) > time.time():
+            return False
+        # An expired session counts again once its file is replaced by a new login
+        return entry.get("status") != EXPIRED or entry.get("mtime") != path.stat().st_mtime
+
+    async def check(self, files=None):
+        """Probes the sessions concurrently and records their status."""
+        files = self.files if files is None else files
+        timeout = aiohttp.ClientTimeout(total=15)
+        async with aiohttp.ClientSession(timeout=timeout) as http:
+            statuses = await asyncio.gather(
+                *(probe_session(http, path, self.probe_url) for path in files)
+            )
+        for path, status in zip(files, statuses):
+            entry = self.entry(path)
+            entry["status"] = status
+            entry["checked_at"] = time.time()
+            entry["mtime"] = path.stat().st_mtime
+            if status == RATE_LIMITED:
+                self.quarantine(path, save=False)
+        self.save_state()
+        return dict(zip(files, statuses))
+
+    async def acquire(self, probe=True):
+        """
+        The next usable session file, or None. With `probe`, a session that
+        was not checked in the last 10 minutes is probed before it is handed
+        out.
+        """
+        candidates = [path for path in self.files if self.usable(path)]
+        if self.strategy == "lru":
+            candidates.sort(key=lambda path: self.entry(path).get("last_used", 0))
+        elif candidates:
+            start = self.turn % len(candidates)
+            candidates = candidates[start:] + candidates[:start]
+            self.turn += 1
+        for path in candidates:
+            entry = self.entry(path)
+            # Claimed before probing so concurrent callers pick another one
+            entry["last_used"] = time.time()
+            fresh = entry.get("mtime") == path.stat().st_mtime
+            if probe and (not fresh or time.time() - entry.get("checked_at", 0) > 600):
+                status = (await self.check([path]))[path]
+                if status in (EXPIRED, RATE_LIMITED):
+                    log(f"⚠️ Session {path.name} is {status.replace('_', ' ')}, skipping it")
+                    continue
+            self.save_state()
+            return path
+        return None
+
+    def quarantine(self, path, seconds=None, save=True):
+        until = time.time() + (seconds or self.quarantine_seconds)
+        self.entry(path)["quarantined_until"] = until
+        log(f"🚧 Session {Path(path).name} quarantined for {(until - time.time()) / 60:.0f} min")
+        if save:
+            self.save_state()
+
+    def quarantine_if_limited(self, path, traffic):
+        """Quarantines `path` when its scrape `traffic` saw a 429. Returns whether it did."""
+        if not traffic["rate_limited"]:
+            return False
+        self.quarantine(path)
+        return True
+
+    def describe(self):
+        """One status line per session."""
+        now = time.time()
+        lines = []
+        for path in self.files:
+            entry = self.entry(path)
+            status = entry.get("status", "unchecked")
+            until = entry.get("quarantined_until", 0)
+            if until > now:
+                status += f", quarantined {int((until - now) / 60)} more min"
+            lines.append(f"• {path}: {status}")
+        return lines
@@ -0,0 +1,149 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from models import GainRecord, ReelRecord
+from utils import log
+
+DB_FILE = "reels.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reels (
+    code TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    engagement REAL NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    code TEXT NOT NULL,
+    captured_at REAL NOT NULL,
+    plays INTEGER NOT NULL,
+    likes INTEGER NOT NULL,
+    PRIMARY KEY (code, captured_at)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS reels_plays ON reels (plays);
+CREATE INDEX IF NOT EXISTS reels_likes ON reels (likes);
+CREATE INDEX IF NOT EXISTS reels_engagement ON reels (engagement);
+CREATE INDEX IF NOT EXISTS reels_last_seen ON reels (last_seen);
+CREATE INDEX IF NOT EXISTS snapshots_captured_at ON snapshots (captured_at);
+"""
+
+# Sort names accepted by `query_reels`, mapped to indexed columns
+SORT_COLUMNS = {"plays": "plays", "likes": "likes", "engagement": "engagement"}
+
+
+def connect(db_path):
+    """Opens (and creates if needed) the metrics store at `db_path`."""
+    conn = sqlite3.connect(str(db_path))
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def default_db_path(data_dir):
+    return Path(data_dir) / DB_FILE
+
+
+def is_empty(conn):
+    return conn.execute("SELECT 1 FROM snapshots LIMIT 1").fetchone() is None
+
+
+def ingest(conn, rows, say=log):
+    """
+    Stores one snapshot per (reel, capture time) and moves each reel's
+    current metrics forward when the snapshot is newer than what it holds.
+    Re-ingesting the same rows is a no-op. Returns the snapshots stored.
+    """
+    count = 0
+    with conn:
+        for row in rows:
+            code = row.key
+            if not code:
+                continue
+            plays = row.plays
+            likes = row.likes
+            captured_at = float(row.captured_at or 0)
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO snapshots (code, captured_at, plays, likes) "
+                "VALUES (?, ?, ?, ?)",
+                (code, captured_at, plays, likes),
+            )
+            conn.execute(
+                """
+                INSERT INTO reels (code, url, plays, likes, engagement, first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (code) DO UPDATE SET
+                    url = excluded.url,
+                    plays = CASE WHEN excluded.last_seen >= last_seen
+                                 THEN excluded.plays ELSE plays END,
+                    likes = CASE WHEN excluded.last_seen >= last_seen
+                                 THEN excluded.likes ELSE likes END,
+                    engagement = CASE WHEN excluded.last_seen >= last_seen
+                                      THEN excluded.engagement ELSE engagement END,
+                    first_seen = MIN(first_seen, excluded.first_seen),
+                    last_seen = MAX(last_seen, excluded.last_seen)
+                """,
+                (code, row.url, plays, likes, row.engagement,
+                 captured_at, captured_at),
+            )
+            # Snapshots already stored are ignored and not counted
+            count += cursor.rowcount
+    if say:
+        say(f"🗃️ Stored {count} snapshots")
+    return count
+
+
+def to_record(row, cls=ReelRecord, **extra):
+    # Reels stored under their pk have no url
+    code, pk = (row["code"], None) if row["url"] else ("", row["code"])
+    return cls(code, row["plays"], row["likes"], row["last_seen"], pk=pk, **extra)
+
+
+def query_reels(conn, order_by=("plays",), limit=None):
+    """Current metrics of every reel, ordered by the given sort names (descending)."""
+    columns = [SORT_COLUMNS[key] for key in order_by] or ["plays"]
+    sql = "SELECT * FROM reels ORDER BY " + ", ".join(f"{c} DESC" for c in columns)
+    params = ()
+    if limit:
+        sql += " LIMIT ?"
+        params = (int(limit),)
+    return [to_record(row) for row in conn.execute(sql, params)]
+
+
+def top_gainers(conn, hours=24, limit=None):
+    """
+    Reels ordered by plays gained over the last `hours`: the newest snapshot
+    against the last snapshot before the window (or the first one inside it).
+    """
+    since = time.time() - hours * 3600
+    sql = """
+        WITH recent AS (
+            SELECT code, MIN(captured_at) AS first_at, MAX(captured_at) AS last_at
+            FROM snapshots WHERE captured_at >= ? GROUP BY code
+        )
+        SELECT r.*, latest.plays - COALESCE(
+            (SELECT s.plays FROM snapshots s
+             WHERE s.code = recent.code AND s.captured_at < ?
+             ORDER BY s.captured_at DESC LIMIT 1),
+            earliest.plays
+        ) AS plays_gained
+        FROM recent
+        JOIN reels r ON r.code = recent.code
+        JOIN snapshots latest
+            ON latest.code = recent.code AND latest.captured_at = recent.last_at
+        JOIN snapshots earliest
+            ON earliest.code = recent.code AND earliest.captured_at = recent.first_at
+        ORDER BY plays_gained DESC
+    """
+    params = [since, since]
+    if limit:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return [
+        to_record(row, GainRecord, plays_gained=row["plays_gained"])
+        for row in conn.execute(sql, params)
+    ]
@@ -0,0 +1,106 @@
+"""Local stand-ins for the Instagram endpoints the scraper talks to."""
+import contextlib
+import json
+from urllib.parse import parse_qs
+
+from aiohttp import web
+
+from reels import CLIPS_CONNECTION
+
+
+def reels_page(codes, end_cursor, has_next_page=True):
+    edges = [
+        {"node": {"media": {"code": code, "play_count": 100, "like_count": 10}}}
+        for code in codes
+    ]
+    return {"data": {CLIPS_CONNECTION: {
+        "edges": edges,
+        "page_info": {"end_cursor": end_cursor, "has_next_page": has_next_page},
+    }}}
+
+
+def canned_pages(count, per_page=3):
+    """{after cursor: page}: c0 -> page 1 ... c{count-1} -> the last page."""
+    return {
+        f"c{n}": reels_page(
+            [f"R{n}_{i}" for i in range(per_page)],
+            f"c{n + 1}",
+            has_next_page=n + 1 < count,
+        )
+        for n in range(count)
+    }
+
+
+@contextlib.asynccontextmanager
+async def serve(app):
+    """Runs `app` on a free local port and yields its base url."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def graphql_app(pages, seen, malformed=0):
+    """
+    Answers reels GraphQL POSTs from `pages`, recording each `after` cursor
+    in `seen`. The first `malformed` answers are a 200 that is not JSON.
+    """
+    broken = [malformed]
+
+    async def query(request):
+        form = parse_qs(await request.text())
+        cursor = json.loads(form["variables"][0]).get("after")
+        seen.append(cursor)
+        if broken[0]:
+            broken[0] -= 1
+            return web.Response(text="not json", content_type="application/json")
+        if cursor not in pages:
+            return web.json_response({"errors": ["bad cursor"]}, status=400)
+        return web.json_response(pages[cursor])
+
+    app = web.Application()
+    app.router.add_post("/graphql/query", query)
+    return app
+
+
+def video_app(videos, requests, cut_once=()):
+    """
+    Serves fake MP4 bytes from `videos` ({name: bytes}) at /v/<name>, with
+    Range support (206, or 416 past the end). Names in `cut_once` drop the
+    connection halfway through their first response. Every request is
+    recorded in `requests` as (name, Range header).
+    """
+    cut = set(cut_once)
+
+    async def video(request):
+        name = request.match_info["name"]
+        requests.append((name, request.headers.get("Range")))
+        if name not in videos:
+            return web.Response(status=410)
+        body = videos[name]
+        offset = 0
+        if request.headers.get("Range"):
+            offset = int(request.headers["Range"].split("=")[1].rstrip("-"))
+            if offset >= len(body):
+                return web.Response(status=416)
+        response = web.StreamResponse(status=206 if offset else 200)
+        response.content_length = len(body) - offset
+        response.content_type = "video/mp4"
+        await response.prepare(request)
+        if name in cut:
+            cut.discard(name)
+            await response.write(body[offset:offset + (len(body) - offset) // 2])
+            # Short of the promised length, so the client sees a broken transfer
+            request.transport.close()
+            return response
+        await response.write(body[offset:])
+        return response
+
+    app = web.Application()
+    app.router.add_get("/v/{name}", video)
+    return app
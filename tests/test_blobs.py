@@ -0,0 +1,53 @@
+import hashlib
+import os
+
+import blobs
+import journal
+
+
+def add_blob(base, content):
+    sha256 = hashlib.sha256(content).hexdigest()
+    download = base / f"{sha256}.part"
+    download.write_bytes(content)
+    return blobs.store_blob(base, download, sha256)
+
+
+def test_gc_removes_only_unreferenced_blobs_and_forgets_them(tmp_path):
+    folder = tmp_path / "top"
+    folder.mkdir()
+    hard = add_blob(tmp_path, b"hardlinked")
+    soft = add_blob(tmp_path, b"symlinked")
+    orphan = add_blob(tmp_path, b"unreferenced")
+    blobs.link_blob(hard, folder / "AAA.mp4")
+    os.symlink(os.path.relpath(soft, folder), folder / "BBB.mp4")
+
+    conn = journal.connect(tmp_path / journal.JOURNAL_FILE)
+    for reel_id, blob in (("AAA", hard), ("BBB", soft), ("CCC", orphan)):
+        journal.finish(conn, reel_id, f"https://www.instagram.com/reel/{reel_id}/",
+                       blob, blob.stat().st_size, blob.stem)
+
+    assert blobs.collect_garbage(tmp_path, dry_run=True) == [orphan.stem]
+    assert all(blob.exists() for blob in (hard, soft, orphan))
+
+    removed = blobs.collect_garbage(tmp_path)
+    assert removed == [orphan.stem]
+    assert hard.exists() and soft.exists()
+    assert not orphan.exists() and not orphan.parent.exists()
+    assert (folder / "AAA.mp4").read_bytes() == b"hardlinked"
+    assert (folder / "BBB.mp4").read_bytes() == b"symlinked"
+
+    journal.forget(conn, removed)
+    assert sorted(journal.entries(conn)) == ["AAA", "BBB"]
+    conn.close()
+
+
+def test_blob_whose_link_was_deleted_is_collected(tmp_path):
+    folder = tmp_path / "top"
+    folder.mkdir()
+    blob = add_blob(tmp_path, b"video")
+    blobs.link_blob(blob, folder / "AAA.mp4")
+    assert blobs.collect_garbage(tmp_path) == []
+
+    (folder / "AAA.mp4").unlink()
+    assert blobs.collect_garbage(tmp_path) == [blob.stem]
+    assert not blob.exists()
@@ -0,0 +1,37 @@
+import asyncio
+import json
+
+from capture import CaptureWriter
+
+URL = "https://www.instagram.com/graphql/query"
+PAGE = {
+    "data": {"xdt_api__v1__clips__user__connection_v2": {
+        "edges": [{"node": {"media": {
+            "code": "AAA", "play_count": 10, "user": {"username": "x" * 500},
+        }}}],
+        "page_info": {"end_cursor": "c1", "has_next_page": True},
+    }}
+}
+
+
+def write(tmp_path, raw_sample, size=None):
+    async def run():
+        async with CaptureWriter(tmp_path, projection="minimal", raw_sample=raw_sample) as writer:
+            await writer.put(PAGE, URL, size)
+            await writer.put(PAGE, URL, size)
+        return writer.stats
+
+    return asyncio.run(run())
+
+
+def test_projection_counts_the_body_size_passed_in(tmp_path):
+    stats = write(tmp_path, 0.0, size=1000)
+    assert stats["bytes_in"] == 2000
+    assert 0 < stats["bytes_kept"] < len(json.dumps(PAGE)) * 2
+
+
+def test_raw_samples_count_in_and_kept_in_full(tmp_path):
+    stats = write(tmp_path, 1.0)
+    size = len(json.dumps(PAGE, separators=(",", ":")))
+    assert stats["raw_samples"] == 2
+    assert stats["bytes_in"] == stats["bytes_kept"] == 2 * size
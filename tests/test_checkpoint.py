@@ -0,0 +1,33 @@
+from checkpoint import Checkpoint
+
+
+def page(codes, cursor):
+    return {
+        "edges": [{"node": {"media": {"code": code}}} for code in codes],
+        "page_info": {"end_cursor": cursor, "has_next_page": True},
+    }
+
+
+def scrape(tmp_path, pages, incremental=False):
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.start_from_top(incremental)
+    for connection in pages:
+        checkpoint.count_scroll()
+        checkpoint.observe(connection)
+    checkpoint.save()
+    return Checkpoint(tmp_path)
+
+
+def test_runs_from_the_top_count_their_own_scrolls(tmp_path):
+    saved = scrape(tmp_path, [page(["A"], "c1"), page(["B"], "c2"), page(["C"], "c3")])
+    assert (saved.scrolls, saved.end_cursor) == (3, "c3")
+
+    saved = scrape(tmp_path, [page(["D"], "d1")])
+    assert (saved.scrolls, saved.end_cursor) == (1, "d1")
+
+
+def test_incremental_run_keeps_the_deepest_cursor_and_its_count(tmp_path):
+    scrape(tmp_path, [page(["A"], "c1"), page(["B"], "c2")])
+    saved = scrape(tmp_path, [page(["N", "A"], "n1")], incremental=True)
+    assert (saved.scrolls, saved.end_cursor) == (2, "c2")
+    assert saved.seen == {"A", "B", "N"}
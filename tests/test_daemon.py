@@ -0,0 +1,65 @@
+import asyncio
+
+from daemon import BrowserDaemon
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.connected = True
+
+    def is_connected(self):
+        return self.connected
+
+    async def close(self):
+        self.connected = False
+
+
+class FakePlaywright:
+    def __init__(self):
+        self.launches = 0
+        self.chromium = self
+
+    async def launch(self, **options):
+        self.launches += 1
+        await asyncio.sleep(0.05)
+        return FakeBrowser()
+
+
+def test_lease_never_waits_for_a_launch():
+    async def run():
+        p = FakePlaywright()
+        daemon = BrowserDaemon(p, warm=1, max_browsers=2, headless=True)
+        await daemon.fill()
+        assert p.launches == 1
+
+        first = daemon.lease(headless=True)
+        assert first is not None
+        # The last idle browser is gone, so the daemon wants a spare...
+        assert daemon.wanted.is_set()
+        # ...but a lease in the meantime is refused instead of launching one
+        assert daemon.lease(headless=True) is None
+        assert p.launches == 1
+
+        await daemon.maintain()
+        assert p.launches == 2
+        second = daemon.lease(headless=True)
+        assert second is not None and second is not first
+        # At the maximum, nothing more is launched
+        await daemon.maintain()
+        assert p.launches == 2
+        assert daemon.lease(headless=True) is None
+
+        daemon.release(first.lease)
+        assert daemon.lease(headless=True) is first
+
+    asyncio.run(run())
+
+
+def test_lease_refuses_the_other_headless_mode():
+    async def run():
+        daemon = BrowserDaemon(FakePlaywright(), warm=1, headless=False)
+        await daemon.fill()
+        assert daemon.lease(headless=True) is None
+        assert daemon.lease(headless=False) is not None
+
+    asyncio.run(run())
@@ -0,0 +1,15 @@
+from intrecept import name_targets
+
+
+def test_name_targets_drops_repeats_and_splits_clashing_folders():
+    targets = name_targets([
+        "instagram.com/nasa/reels",
+        "https://www.instagram.com/nasa/reels/?hl=en",
+        "https://www.instagram.com/nasa/",
+        "https://www.instagram.com/esa/reels/",
+    ])
+    assert targets == {
+        "https://www.instagram.com/nasa/reels/": "nasa",
+        "https://www.instagram.com/nasa/": "nasa-2",
+        "https://www.instagram.com/esa/reels/": "esa",
+    }
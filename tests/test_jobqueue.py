@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import jobqueue
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# A worker process with a stub handler that logs every run. The "crash"
+# job kills its worker mid-job the first time, "broken" always fails.
+WORKER = """
+import asyncio, os, sys, time
+import jobqueue
+
+db_path, runs = sys.argv[1], sys.argv[2]
+
+async def handle(job, options):
+    with open(runs, "a") as f:
+        f.write(f"{job['target']} {os.getpid()}\\n")
+    if job["target"] == "crash" and job["attempts"] == 1:
+        os._exit(1)
+    if job["target"] == "broken":
+        raise RuntimeError("always fails")
+    await asyncio.sleep(0.05)
+
+asyncio.run(jobqueue.run_worker(
+    db_path, {"scrape": handle}, lease_seconds=1, poll_seconds=0.1,
+    exit_when_empty=True, backoff=0,
+))
+"""
+
+
+def test_workers_share_the_queue_and_recover_a_crashed_job(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    runs = tmp_path / "runs.txt"
+    conn = jobqueue.connect(db_path)
+    targets = [f"job{i}" for i in range(12)]
+    for target in ["crash", *targets]:
+        jobqueue.add(conn, jobqueue.SCRAPE, target)
+    jobqueue.add(conn, jobqueue.SCRAPE, "broken", max_attempts=2)
+
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    workers = [
+        subprocess.Popen([sys.executable, "-c", WORKER, str(db_path), str(runs)], env=env)
+        for _ in range(3)
+    ]
+    deadline = time.time() + 30
+    for worker in workers:
+        worker.wait(timeout=max(1, deadline - time.time()))
+    # Only the worker that took the crash job died
+    assert sorted(worker.returncode for worker in workers) == [0, 0, 1]
+
+    lines = [line.split() for line in runs.read_text().splitlines()]
+    seen = [target for target, _ in lines]
+    # Every other job ran exactly once
+    assert sorted(t for t in seen if t.startswith("job")) == sorted(targets)
+    # The crashed job was picked up again by another worker once its lease expired
+    crash_pids = [pid for target, pid in lines if target == "crash"]
+    assert len(crash_pids) == 2 and crash_pids[0] != crash_pids[1]
+    # The broken job stopped at its attempt limit
+    assert seen.count("broken") == 2
+
+    jobs = {row["target"]: row for row in conn.execute("SELECT * FROM jobs")}
+    assert all(jobs[t]["status"] == jobqueue.DONE for t in targets)
+    assert jobs["crash"]["status"] == jobqueue.DONE and jobs["crash"]["attempts"] == 2
+    assert jobs["broken"]["status"] == jobqueue.FAILED and jobs["broken"]["attempts"] == 2
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+
+def test_targets_lists_one_kind_oldest_first(tmp_path):
+    conn = jobqueue.connect(tmp_path / "jobs.db")
+    for kind, target in [("scrape", "b"), ("download", "x.csv"), ("scrape", "a"), ("scrape", "b")]:
+        jobqueue.add(conn, kind, target)
+    assert jobqueue.targets(conn, jobqueue.SCRAPE) == ["b", "a"]
+    conn.close()
@@ -0,0 +1,195 @@
+import asyncio
+import csv
+import hashlib
+import os
+import stat
+import time
+
+from capture import CaptureLog
+from downloader import download_reels_from_csv
+from media import fetch_video, index_video_versions, open_session, pick_rendition
+from scheduler import Budget
+from standins import serve, video_app
+
+VIDEO = os.urandom(300_000)
+
+
+def fetch(tmp_path, videos, name, requests):
+    output_file = tmp_path / "out.mp4"
+
+    async def run():
+        async with serve(video_app(videos, requests)) as base_url, open_session() as session:
+            return await fetch_video(session, f"{base_url}/v/{name}", output_file)
+
+    return asyncio.run(run()), output_file
+
+
+def test_pick_rendition():
+    versions = [
+        {"url": "sd", "height": 640, "width": 360},
+        {"url": "hd", "height": 1280, "width": 720},
+        {"url": "md", "height": 960, "width": 540},
+    ]
+    assert pick_rendition(versions, "best") == "hd"
+    assert pick_rendition(versions, "worst") == "sd"
+    assert pick_rendition(versions, "720") == "sd"
+    assert pick_rendition(versions, "1000") == "md"
+    assert pick_rendition([], "best") is None
+
+
+def test_index_reads_per_target_capture_folders(tmp_path):
+    def capture(folder, url, ts):
+        folder.mkdir()
+        capture_log = CaptureLog(folder)
+        media = {"code": "AAA", "video_versions": [{"url": url}]}
+        capture_log.append(
+            {"data": {"xdt_api__v1__clips__user__connection_v2": {
+                "edges": [{"node": {"media": media}}]
+            }}},
+            "https://www.instagram.com/graphql/query", ts,
+        )
+        capture_log.close()
+
+    capture(tmp_path / "nasa", "old", 1)
+    capture(tmp_path / "esa", "new", 2)
+    assert index_video_versions(tmp_path) == {"AAA": [{"url": "new"}]}
+
+
+def test_full_download(tmp_path):
+    requests = []
+    (size, sha256), output_file = fetch(tmp_path, {"a": VIDEO}, "a", requests)
+    assert output_file.read_bytes() == VIDEO
+    assert (size, sha256) == (len(VIDEO), hashlib.sha256(VIDEO).hexdigest())
+    assert requests == [("a", None)]
+    assert not (tmp_path / "out.mp4.part").exists()
+
+
+def test_partial_file_is_resumed_with_a_range_request(tmp_path):
+    (tmp_path / "out.mp4.part").write_bytes(VIDEO[:1000])
+    requests = []
+    (size, sha256), output_file = fetch(tmp_path, {"a": VIDEO}, "a", requests)
+    assert requests == [("a", "bytes=1000-")]
+    assert output_file.read_bytes() == VIDEO
+    assert sha256 == hashlib.sha256(VIDEO).hexdigest()
+
+
+def test_partial_file_past_the_end_starts_over(tmp_path):
+    (tmp_path / "out.mp4.part").write_bytes(b"x" * (len(VIDEO) + 10))
+    requests = []
+    (size, sha256), output_file = fetch(tmp_path, {"a": VIDEO}, "a", requests)
+    assert requests == [("a", f"bytes={len(VIDEO) + 10}-"), ("a", None)]
+    assert output_file.read_bytes() == VIDEO
+
+
+def fake_ytdlp(bin_dir):
+    script = bin_dir / "yt-dlp"
+    script.write_text(
+        '#!/bin/sh\n'
+        'while [ $# -gt 0 ]; do\n'
+        '  if [ "$1" = "-o" ]; then shift; printf ytdlp > "$1"; fi; shift\n'
+        'done\n'
+    )
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+
+def write_csv(csv_path, codes):
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["url", "plays"])
+        for code, plays in codes:
+            writer.writerow([f"instagram.com/reel/{code}/", plays])
+
+
+def write_captures(tmp_path, base_url, codes):
+    """A capture folder holding a captured video URL on `base_url` for each code."""
+    captures = tmp_path / "captures"
+    captures.mkdir()
+    capture_log = CaptureLog(captures)
+    edges = [
+        {"node": {"media": {"code": code, "video_versions": [
+            {"url": f"{base_url}/v/{code}", "height": 1280}
+        ]}}}
+        for code in codes
+    ]
+    capture_log.append(
+        {"data": {"xdt_api__v1__clips__user__connection_v2": {"edges": edges}}},
+        f"{base_url}/graphql/query", time.time(),
+    )
+    capture_log.close()
+    return captures
+
+
+def test_broken_transfer_resumes_and_expired_link_falls_back_to_ytdlp(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake_ytdlp(bin_dir)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    csv_path = tmp_path / "top.csv"
+    write_csv(csv_path, [("AAA", "1K"), ("BBB", "2K")])
+
+    requests = []
+
+    async def run():
+        app = video_app({"AAA": VIDEO}, requests, cut_once={"AAA"})
+        async with serve(app) as base_url:
+            captures = write_captures(tmp_path, base_url, ("AAA", "BBB"))
+            return await download_reels_from_csv(
+                csv_path=csv_path, output_folder=tmp_path / "downloads" / "top",
+                captures=captures, rate=100, retries=2,
+            )
+
+    results = asyncio.run(run())
+    assert results["success"] == 2
+    aaa = [rng for name, rng in requests if name == "AAA"]
+    assert aaa[0] is None and aaa[1].startswith("bytes=") and aaa[1] != "bytes=0-"
+    assert (tmp_path / "downloads" / "top" / "AAA—1K.mp4").read_bytes() == VIDEO
+    assert (tmp_path / "downloads" / "top" / "BBB—2K.mp4").read_bytes() == b"ytdlp"
+    assert [name for name, _ in requests].count("BBB") == 1
+
+
+def test_zero_retries_still_tries_each_reel_once(tmp_path):
+    csv_path = tmp_path / "top.csv"
+    write_csv(csv_path, [("AAA", "1K")])
+    requests = []
+    events = []
+
+    async def run():
+        async with serve(video_app({"AAA": VIDEO}, requests, cut_once={"AAA"})) as base_url:
+            return await download_reels_from_csv(
+                csv_path=csv_path, output_folder=tmp_path / "downloads" / "top",
+                captures=write_captures(tmp_path, base_url, ["AAA"]), rate=100, retries=0,
+                on_progress=events.append,
+            )
+
+    results = asyncio.run(run())
+    assert results["failed"] == 1
+    assert [(event["reel_id"], event["status"]) for event in events] == [("AAA", "failed")]
+    assert requests == [("AAA", None)]
+
+
+def test_spent_budget_still_links_stored_reels(tmp_path):
+    first_csv = tmp_path / "first.csv"
+    write_csv(first_csv, [("BBB", "1K")])
+    second_csv = tmp_path / "second.csv"
+    write_csv(second_csv, [("CCC", "5K"), ("AAA", "3K"), ("BBB", "1K")])
+    videos = {"AAA": VIDEO, "BBB": VIDEO[:1000], "CCC": VIDEO[:2000]}
+
+    async def run():
+        async with serve(video_app(videos, [])) as base_url:
+            captures = write_captures(tmp_path, base_url, videos)
+            await download_reels_from_csv(
+                csv_path=first_csv, output_folder=tmp_path / "downloads" / "first",
+                captures=captures, rate=100,
+            )
+            return await download_reels_from_csv(
+                csv_path=second_csv, output_folder=tmp_path / "downloads" / "second",
+                captures=captures, rate=100, concurrency=2, order_by="plays",
+                budget=Budget(max_count=1),
+            )
+
+    results = asyncio.run(run())
+    assert (results["success"], results["linked"]) == (1, 1)
+    second = tmp_path / "downloads" / "second"
+    assert (second / "CCC—5K.mp4").exists() and (second / "BBB—1K.mp4").exists()
+    assert not (second / "AAA—3K.mp4").exists()
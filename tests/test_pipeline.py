@@ -0,0 +1,27 @@
+from capture import CLIPS_CONNECTION, CaptureLog
+from pipeline import extract_top
+from reels import load_all_data
+
+URL = "https://www.instagram.com/graphql/query"
+
+
+def test_extract_top_matches_the_head_of_a_full_extract(tmp_path):
+    capture_log = CaptureLog(tmp_path)
+    for ts in range(1, 6):
+        media = [
+            {"code": f"R{i}", "play_count": i * 100 + ts, "like_count": (i * 37 + ts) % 50}
+            for i in range(ts, ts + 20)
+        ]
+        capture_log.append(
+            {"data": {CLIPS_CONNECTION: {"edges": [{"node": {"media": m}} for m in media]}}},
+            URL, ts,
+        )
+    capture_log.close()
+
+    for order_by in (["plays"], ["likes", "plays"]):
+        top = extract_top(tmp_path, 5, order_by, chunk_rows=7)
+        full = sorted(
+            load_all_data(tmp_path, full_rebuild=True),
+            key=lambda row: tuple(-getattr(row, key) for key in order_by),
+        )
+        assert [row.to_list() for row in top] == [row.to_list() for row in full[:5]]
@@ -0,0 +1,45 @@
+import json
+import os
+
+from capture import CLIPS_CONNECTION
+from reels import EXTRACT_ROWS, load_all_data
+
+
+def write_capture(data_dir, n, reels):
+    page = {"data": {CLIPS_CONNECTION: {"edges": [
+        {"node": {"media": {"code": code, "play_count": plays}}} for code, plays in reels
+    ]}}}
+    path = data_dir / f"graphql_{1_700_000_000_000 + n}.json"
+    path.write_text(json.dumps(page), encoding="utf-8")
+    return path
+
+
+def rows(data_dir, **options):
+    return sorted(row.to_list() for row in load_all_data(data_dir, **options))
+
+
+def test_cached_rows_match_a_full_rebuild(tmp_path, capsys):
+    write_capture(tmp_path, 1, [("AAA", 10), ("BBB", 20)])
+    changed = write_capture(tmp_path, 2, [("AAA", 15)])
+    first = rows(tmp_path)
+    assert [row[:2] for row in first] == [["AAA", 15], ["BBB", 20]]
+
+    write_capture(tmp_path, 3, [("CCC", 30)])
+    changed.write_text(changed.read_text().replace("15", "17"), encoding="utf-8")
+    os.utime(changed, ns=(1, 1))
+    capsys.readouterr()
+    again = rows(tmp_path)
+    assert "2 parsed, 1 unchanged" in capsys.readouterr().out
+    assert again == rows(tmp_path, full_rebuild=True)
+    assert [row[:2] for row in again] == [["AAA", 17], ["BBB", 20], ["CCC", 30]]
+
+
+def test_lost_cached_rows_are_parsed_again(tmp_path, capsys):
+    write_capture(tmp_path, 1, [("AAA", 10)])
+    write_capture(tmp_path, 2, [("BBB", 20)])
+    expected = rows(tmp_path)
+    rows_file = tmp_path / EXTRACT_ROWS
+    rows_file.write_text(rows_file.read_text().splitlines()[0] + "\n{broken", encoding="utf-8")
+    capsys.readouterr()
+    assert rows(tmp_path) == expected
+    assert "1 parsed, 1 unchanged" in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import asyncio
+
+from capture import iter_captures
+from checkpoint import Checkpoint
+from replay import replay_pages
+from standins import canned_pages, graphql_app, serve
+
+
+def template(base_url):
+    return {
+        "url": f"{base_url}/graphql/query",
+        "method": "POST",
+        "headers": {},
+        "post_data": "doc_id=1&variables=%7B%22first%22%3A3%7D",
+        "end_cursor": "c0",
+        "has_next_page": True,
+    }
+
+
+def replay(tmp_path, pages, malformed=0, **options):
+    seen = []
+
+    async def run():
+        async with serve(graphql_app(pages, seen, malformed)) as base_url:
+            return await replay_pages(
+                template(base_url), output_dir=tmp_path, page_delay=0, **options
+            )
+
+    return asyncio.run(run()), seen
+
+
+def test_pages_follow_the_cursor_to_the_end_of_the_feed(tmp_path):
+    saved, seen = replay(tmp_path, canned_pages(4))
+    assert saved == 4
+    assert seen == ["c0", "c1", "c2", "c3"]
+    assert len(list(iter_captures(tmp_path))) == 4
+
+
+def test_malformed_reply_is_retried_with_the_same_form(tmp_path):
+    saved, seen = replay(tmp_path, canned_pages(2), malformed=1)
+    assert saved == 2
+    assert seen == ["c0", "c0", "c1"]
+
+
+def test_max_pages_caps_the_run(tmp_path):
+    saved, seen = replay(tmp_path, canned_pages(4), max_pages=2)
+    assert saved == 2
+    assert seen == ["c0", "c1"]
+
+
+def test_checkpoint_keeps_the_last_cursor_and_resumes_from_it(tmp_path):
+    checkpoint = Checkpoint(tmp_path)
+    replay(tmp_path, canned_pages(4), max_pages=2, checkpoint=checkpoint)
+    checkpoint = Checkpoint(tmp_path)
+    assert checkpoint.end_cursor == "c2"
+    assert checkpoint.has_next_page
+
+    saved, seen = replay(
+        tmp_path, canned_pages(4), cursor=checkpoint.end_cursor, checkpoint=checkpoint
+    )
+    assert saved == 2
+    assert seen == ["c2", "c3"]
+    assert not Checkpoint(tmp_path).has_next_page
+
+
+def test_incremental_stops_at_reels_seen_in_a_previous_run(tmp_path):
+    pages = canned_pages(4)
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.seen.update(["R1_0"])
+    checkpoint.save()
+    checkpoint = Checkpoint(tmp_path)
+    checkpoint.keep_cursor = True
+
+    saved, seen = replay(tmp_path, pages, checkpoint=checkpoint, incremental=True)
+    assert saved == 2
+    assert seen == ["c0", "c1"]
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import Budget, Progress, prioritize
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=100.0)
+    monkeypatch.setattr(scheduler, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_prioritize_orders_by_the_chosen_metric():
+    rows = [
+        {"url": "a", "plays": "1.2K", "likes": "10", "engagement_rate": "0.83%"},
+        {"url": "b", "plays": "3M", "likes": "5", "engagement_rate": "0.00%"},
+        {"url": "c", "plays": "900", "likes": "", "engagement_rate": "2.50%"},
+    ]
+    assert [row["url"] for row in prioritize(rows)] == ["a", "b", "c"]
+    assert [row["url"] for row in prioritize(rows, "plays")] == ["b", "a", "c"]
+    assert [row["url"] for row in prioritize(rows, "likes")] == ["a", "b", "c"]
+    assert [row["url"] for row in prioritize(rows, "engagement")] == ["c", "a", "b"]
+
+
+def test_count_budget_counts_downloads_in_flight(clock):
+    budget = Budget(max_count=2)
+    budget.reserve()
+    assert budget.exhausted() is None
+    budget.reserve()
+    assert "2 reels" in budget.exhausted()
+
+    # A failed download gives its slot back
+    budget.release()
+    assert budget.exhausted() is None
+    budget.spend(500)
+    assert (budget.count, budget.bytes, budget.pending) == (1, 500, 0)
+    assert budget.exhausted() is None
+    budget.reserve()
+    assert "2 reels" in budget.exhausted()
+
+
+def test_byte_and_time_budgets(clock):
+    budget = Budget(max_bytes=1000, max_seconds=60)
+    budget.reserve()
+    budget.spend(999)
+    assert budget.exhausted() is None
+    budget.reserve()
+    budget.spend(1)
+    assert "byte budget" in budget.exhausted()
+
+    budget = Budget(max_seconds=60)
+    clock.now += 59
+    assert budget.exhausted() is None
+    clock.now += 1
+    assert "time budget of 60s" in budget.exhausted()
+
+
+def test_progress_throughput_and_eta(clock):
+    progress = Progress(4)
+    clock.now += 10
+    event = progress.event("AAA", "success", 1000)
+    assert (event["reel_id"], event["done"], event["fraction"]) == ("AAA", 1, 0.25)
+    assert event["throughput"] == 100
+    # 3 rows left at 10s per row
+    assert event["eta"] == 30
+
+    clock.now += 10
+    event = progress.event("BBB", "linked")
+    assert (event["bytes"], event["throughput"], event["eta"]) == (1000, 50, 20)
+
+
+def test_progress_eta_is_capped_by_the_budget(clock):
+    budget = Budget(max_bytes=3000, max_seconds=100)
+    progress = Progress(100, budget)
+    clock.now += 10
+    budget.reserve()
+    budget.spend(1000)
+    # 2000 bytes left at 100 B/s, before the 99 rows left would take 990s
+    assert progress.event("AAA", "success", 1000)["eta"] == 20
+
+    budget = Budget(max_seconds=15)
+    progress = Progress(100, budget)
+    clock.now += 10
+    assert progress.event("AAA", "success", 10)["eta"] == 5
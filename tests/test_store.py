@@ -0,0 +1,45 @@
+import time
+
+import store
+from models import ReelRecord
+
+
+def snapshot(code, plays, captured_at, likes=0):
+    return ReelRecord(code, plays=plays, likes=likes, captured_at=captured_at)
+
+
+def test_newer_capture_wins_and_repeats_change_nothing():
+    conn = store.connect(":memory:")
+    rows = [snapshot("AAA", 200, 20, likes=5), snapshot("AAA", 100, 10), snapshot("BBB", 50, 10)]
+    assert store.ingest(conn, rows, say=None) == 3
+    reels = {row.code: row for row in store.query_reels(conn)}
+    assert (reels["AAA"].plays, reels["AAA"].likes, reels["AAA"].captured_at) == (200, 5, 20)
+
+    before = [tuple(row) for row in conn.execute("SELECT * FROM reels ORDER BY code")]
+    assert store.ingest(conn, rows, say=None) == 0
+    assert [tuple(row) for row in conn.execute("SELECT * FROM reels ORDER BY code")] == before
+    assert conn.execute("SELECT COUNT(*) FROM snapshots").fetchone()[0] == 3
+    assert tuple(conn.execute(
+        "SELECT first_seen, last_seen FROM reels WHERE code = 'AAA'"
+    ).fetchone()) == (10, 20)
+
+
+def test_top_gainers_measures_from_the_last_snapshot_before_the_window():
+    conn = store.connect(":memory:")
+    now = time.time()
+    hour = 3600
+    store.ingest(conn, [
+        # Baseline before the window, then two snapshots inside it
+        snapshot("OLD", 1_000, now - 30 * hour),
+        snapshot("OLD", 1_100, now - 5 * hour),
+        snapshot("OLD", 1_500, now - 1 * hour),
+        # First seen inside the window: gained since its first snapshot
+        snapshot("NEW", 100, now - 10 * hour),
+        snapshot("NEW", 900, now - 2 * hour),
+        # Nothing captured inside the window
+        snapshot("IDLE", 5_000, now - 48 * hour),
+    ], say=None)
+
+    gainers = store.top_gainers(conn, hours=24)
+    assert [(row.code, row.plays_gained) for row in gainers] == [("NEW", 800), ("OLD", 500)]
+    assert [row.code for row in store.top_gainers(conn, hours=24, limit=1)] == ["NEW"]
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from watch import WATCH_STATE, Watcher, next_interval
+
+
+def test_profiles_are_normalized_and_get_their_own_folders(tmp_path):
+    (tmp_path / WATCH_STATE).write_text(
+        json.dumps({"instagram.com/nasa/reels": {"interval": 1200, "next_at": 5}}),
+        encoding="utf-8",
+    )
+    watcher = Watcher([
+        "instagram.com/nasa/reels",
+        "https://www.instagram.com/nasa/reels/",
+        "https://www.instagram.com/nasa/",
+    ], tmp_path, pool=None)
+    assert watcher.names == {
+        "https://www.instagram.com/nasa/reels/": "nasa",
+        "https://www.instagram.com/nasa/": "nasa-2",
+    }
+    assert watcher.urls == list(watcher.names)
+    # A profile saved under the URL as typed keeps its schedule
+    assert watcher.profile("https://www.instagram.com/nasa/reels/")["interval"] == 1200
+
+
+@pytest.mark.parametrize("growth, new_reels, expected", [
+    # New reels halve the interval
+    (0.0, 3, 1800),
+    # Plays growing 4x faster than the 2% target: cut by the most allowed, x0.5
+    (0.08, 0, 1800),
+    # Growing at 2.5%: scaled by 0.02 / 0.025
+    (0.025, 0, 2880),
+    # Slow growth or none: stretched by the most allowed, x1.5
+    (0.001, 0, 5400),
+    (0.0, 0, 5400),
+])
+def test_next_interval_follows_growth(growth, new_reels, expected):
+    assert next_interval(3600, growth, new_reels, 60, 86400) == pytest.approx(expected)
+
+
+def test_next_interval_is_clamped_to_min_and_max():
+    assert next_interval(1000, 0.5, 1, min_seconds=900, max_seconds=7200) == 900
+    assert next_interval(6000, 0.0, 0, min_seconds=900, max_seconds=7200) == 7200
@@ -1,5 +1,16 @@
+import asyncio
 import csv
+import hashlib
+import json
+import os
 import sys
+import time
+
+# Browser User-Agent sent with direct HTTP requests to Instagram and its CDN
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/126.0 Safari/537.36"
+)
 
 
 def log(msg):
@@ -10,3 +21,70 @@ def log(msg):
 def load_csv_rows(path):
     with open(path, newline='') as f:
         return list(csv.DictReader(f))
+
+
+def load_json(path, default=None):
+    """The JSON in `path`, or `default` ({}) when it is missing or unreadable."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {} if default is None else default
+
+
+def write_json(path, data, **dump_options):
+    """Writes `data` to a tmp file first, so a crash never leaves half a file at `path`."""
+    path = str(path)
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(data, f, **dump_options)
+    os.replace(tmp_file, path)
+
+
+def hash_file(path, digest=None):
+    """Feeds the file at `path` into `digest` (a new SHA-256 by default) and returns it."""
+    digest = digest or hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+class TokenBucket:
+    """
+    Async token bucket shared by concurrent workers.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum burst size (defaults to 1 token)
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        if self.rate <= 0:
+            raise ValueError(f"TokenBucket rate must be greater than 0, got {rate}")
+        self.capacity = float(capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # The lock makes waiters queue up fairly instead of all waking at once
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
@@ -0,0 +1,171 @@
+import asyncio
+import time
+from pathlib import Path
+
+from playwright.async_api import async_playwright
+
+import store
+from intrecept import SharedBrowser, name_targets, normalize_target, scrape_target
+from reels import load_all_data, write_csv
+from utils import TokenBucket, load_json, log, write_json
+
+WATCH_STATE = ".watch_state.json"
+
+
+def next_interval(interval, growth, new_reels, min_seconds, max_seconds, target=0.02):
+    """
+    The next wait for a profile. New reels halve it. Otherwise the interval
+    is scaled so the plays gained per pass (`growth`, relative to the plays
+    before it) move towards `target`, by at most x0.5 to x1.5 per pass.
+    """
+    if new_reels:
+        factor = 0.5
+    elif growth > 0:
+        factor = min(1.5, max(0.5, target / growth))
+    else:
+        factor = 1.5
+    return min(max_seconds, max(min_seconds, interval * factor))
+
+
+def profile_totals(conn):
+    row = conn.execute(
+        "SELECT COUNT(*) AS reels, COALESCE(SUM(plays), 0) AS plays FROM reels"
+    ).fetchone()
+    return row["reels"], row["plays"]
+
+
+def extract_new(target_dir):
+    """
+    Parses only the captures added since the last pass into the profile's
+    metrics store and rewrites its `reels_summary.csv`. Returns the reel
+    count and total plays.
+    """
+    conn = store.connect(store.default_db_path(target_dir))
+    try:
+        load_all_data(target_dir, store=conn)
+        write_csv(store.query_reels(conn), target_dir / "reels_summary.csv", sort=False)
+        return profile_totals(conn)
+    finally:
+        conn.close()
+
+
+class Watcher:
+    """
+    Re-scrapes a fixed set of profiles, each on its own interval.
+
+    After a pass the profile's new captures are extracted and its interval
+    adapts (`next_interval`): quicker while reels arrive or play counts
+    climb fast, slower while the profile is quiet. Passes share one
+    browser, at most `concurrency` run at once and at most `per_hour`
+    start per hour across all profiles. Intervals and schedule are kept in
+    `<output_dir>/.watch_state.json`, so a restarted watch picks up where
+    it left off.
+    """
+
+    def __init__(self, urls, output_dir, pool, concurrency=2, per_hour=30,
+                 start_seconds=3600, min_seconds=900, max_seconds=86400, **scrape_options):
+        # Normalized and named as in batch, so two spellings of one profile
+        # are watched once and clashing names never share a folder
+        self.names = name_targets(urls)
+        self.urls = list(self.names)
+        self.output_dir = Path(output_dir)
+        self.pool = pool
+        self.semaphore = asyncio.Semaphore(max(1, int(concurrency)))
+        self.limiter = TokenBucket(per_hour / 3600) if per_hour else None
+        self.start_seconds = start_seconds
+        self.min_seconds = min_seconds
+        self.max_seconds = max_seconds
+        self.scrape_options = scrape_options
+        self.state_file = self.output_dir / WATCH_STATE
+        self.state = self.load_state()
+        self.running = set()
+
+    def load_state(self):
+        state = load_json(self.state_file)
+        # Profiles saved under the URL as typed, before URLs were normalized
+        for url in list(state):
+            state.setdefault(normalize_target(url), state.pop(url))
+        return state
+
+    def save_state(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        write_json(self.state_file, self.state, indent=2)
+
+    def profile(self, url):
+        return self.state.setdefault(url, {"interval": self.start_seconds, "next_at": 0})
+
+    def due(self, now):
+        return [
+            url for url in self.urls
+            if url not in self.running and self.profile(url)["next_at"] <= now
+        ]
+
+    async def run_pass(self, url, get_browser):
+        name = self.names[url]
+        target_dir = self.output_dir / name
+        target_dir.mkdir(parents=True, exist_ok=True)
+        profile = self.profile(url)
+        try:
+            async with self.semaphore:
+                if self.limiter:
+                    await self.limiter.acquire()
+                session = await self.pool.acquire()
+                if session is None:
+                    raise RuntimeError("no usable session in the pool")
+                log(f"👀 [{name}] Pass started (interval {profile['interval'] / 60:.0f} min)")
+                traffic = await scrape_target(
+                    await get_browser(), url, session, target_dir, name=name,
+                    incremental=True, **self.scrape_options,
+                )
+                if self.pool.quarantine_if_limited(session, traffic):
+                    raise RuntimeError(f"rate-limited on {Path(session).name}")
+            reels, plays = await asyncio.to_thread(extract_new, target_dir)
+        except Exception as e:
+            profile["failures"] = profile.get("failures", 0) + 1
+            # Retry sooner than a full interval, backing off on repeated failures
+            wait = min(profile["interval"], self.min_seconds * 2 ** (profile["failures"] - 1))
+            profile["next_at"] = time.time() + wait
+            log(f"❌ [{name}] Pass failed: {e}. Retrying in {wait / 60:.0f} min")
+        else:
+            previous = profile.get("plays")
+            if previous is not None:
+                new_reels = max(0, reels - profile["reels"])
+                growth = (plays - previous) / max(previous, 1)
+                profile["interval"] = next_interval(
+                    profile["interval"], growth, new_reels, self.min_seconds, self.max_seconds
+                )
+                log(
+                    f"📈 [{name}] +{new_reels} reels, plays {growth:+.1%} since last pass, "
+                    f"next in {profile['interval'] / 60:.0f} min"
+                )
+            profile.update(reels=reels, plays=plays, failures=0, last_run=time.time())
+            profile["next_at"] = time.time() + profile["interval"]
+        finally:
+            self.running.discard(url)
+            self.save_state()
+
+    async def run(self, headless=True, passes=None, should_stop=None):
+        """Runs until stopped, or until every profile had `passes` passes."""
+        lean = self.scrape_options.get("lean", False)
+        tasks = set()
+        started = dict.fromkeys(self.urls, 0)
+        log(f"🕰️ Watching {len(self.urls)} profiles")
+
+        async with async_playwright() as p:
+            shared = SharedBrowser(p, headless, lean)
+            try:
+                while not (should_stop and should_stop()):
+                    for url in self.due(time.time()):
+                        if passes is None or started[url] < passes:
+                            started[url] += 1
+                            self.running.add(url)
+                            tasks.add(asyncio.create_task(self.run_pass(url, shared.get)))
+                    tasks = {task for task in tasks if not task.done()}
+                    if passes is not None and not tasks and min(started.values()) >= passes:
+                        break
+                    await asyncio.sleep(1)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await shared.close()